@@ -1,11 +1,13 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
+from flask_migrate import Migrate
 from config import Config
 import os
 
 db = SQLAlchemy()
 login_manager = LoginManager()
+migrate = Migrate()
 
 def create_app(config_class=Config):
     # Specify template and static folders relative to project root
@@ -16,7 +18,15 @@ def create_app(config_class=Config):
     app.config.from_object(config_class)
     
     # Initialize extensions
+    from app.database import configure_pool
+    configure_pool(app)
     db.init_app(app)
+    # SQLite cannot ALTER most things in place; batch mode rebuilds the table
+    migrate.init_app(app, db, directory=os.path.join(basedir, 'migrations'), render_as_batch=True)
+    from app.database import configure_sqlite
+    configure_sqlite(app, db)
+    from app.writes import init_write_queue
+    init_write_queue(app)
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
     login_manager.login_message = 'Please log in to access this page.'
@@ -52,11 +62,38 @@ def create_app(config_class=Config):
     from app.document import bp as document_bp
     app.register_blueprint(document_bp, url_prefix='/document')
     
+    # Versioned upload URLs for templates
+    from app.delivery import upload_url, document_url
+    app.add_template_global(upload_url)
+    app.add_template_global(document_url)
+    
+    # Column header links for sortable lists
+    from app.pagination import sort_url
+    app.add_template_global(sort_url)
+    
+    # Register CLI commands
+    from app.stats import stats_cli
+    app.cli.add_command(stats_cli)
+    
+    from app.reports import reports_cli
+    app.cli.add_command(reports_cli)
+    
+    from app.reminders import reminders_cli
+    app.cli.add_command(reminders_cli)
+    
+    from app.storage import storage_cli
+    app.cli.add_command(storage_cli)
+    
+    from app.archive import archive_cli
+    app.cli.add_command(archive_cli)
+    
     return app
 
 from app import models
+from app import softdelete
+from app.users import load_cached_user
 
 @login_manager.user_loader
 def load_user(id):
-    return models.User.query.get(int(id))
+    return load_cached_user(int(id))
 
@@ -1,10 +1,27 @@
-from flask import render_template, redirect, url_for, flash, request
+from flask import render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, current_user
 from app import db
 from app.admin import bp
 from app.models import User, Vehicle, ServiceRequest, ServiceRecord, Invoice
-from datetime import datetime, timedelta
-from sqlalchemy import func, extract
+from app.stats import get_dashboard_stats, get_monthly_revenue, get_invoice_totals, last_months
+from app.reports import (count_today_requests, get_recent_requests, get_request_status_counts, get_yearly_maintenance_totals,
+                         get_vehicle_expenses, get_health_scores, get_worst_vehicles,
+                         vehicle_totals_query, customer_totals_query, NEVER)
+from app.pagination import keyset_paginate, get_sort
+from app.loading import load_options
+from app.users import user_cache_stats
+from app.summary import summary_cache_stats
+from app.writes import run_write, write_queue_stats, WritePending
+from datetime import datetime
+
+def _mark_invoice_paid(invoice_id, payment_date):
+    """Mark an unpaid invoice paid; returns False if it already was"""
+    invoice = db.session.get(Invoice, invoice_id)
+    if invoice.payment_status == 'paid':
+        return False
+    invoice.payment_status = 'paid'
+    invoice.payment_date = payment_date
+    return True
 
 def admin_required(f):
     """Decorator to require admin role"""
@@ -20,87 +37,40 @@ def admin_required(f):
 @login_required
 @admin_required
 def dashboard():
-    # Get statistics
-    total_vehicles = Vehicle.query.filter_by(is_deleted=False).count()
-    total_customers = User.query.filter_by(role='customer', is_deleted=False).count()
+    # Counters are maintained incrementally on write (see app/stats.py)
+    stats = get_dashboard_stats()
     
     # Today's requests
-    today = datetime.now().date()
-    today_requests = ServiceRequest.query.filter(
-        func.date(ServiceRequest.created_at) == today,
-        ServiceRequest.is_deleted == False
-    ).count()
-    
-    # Pending requests
-    pending_requests = ServiceRequest.query.filter_by(status='pending', is_deleted=False).count()
-    
-    # In progress services
-    in_progress = ServiceRequest.query.filter_by(status='in_progress', is_deleted=False).count()
-    
-    # Monthly revenue (current month)
-    current_month = datetime.now().month
-    current_year = datetime.now().year
-    monthly_revenue = db.session.query(func.sum(Invoice.amount)).filter(
-        extract('month', Invoice.created_at) == current_month,
-        extract('year', Invoice.created_at) == current_year,
-        Invoice.payment_status == 'paid',
-        Invoice.is_deleted == False
-    ).scalar() or 0
+    today_requests = count_today_requests()
     
-    # Pending payments
-    pending_payments = db.session.query(func.sum(Invoice.amount)).filter(
-        Invoice.payment_status == 'pending',
-        Invoice.is_deleted == False
-    ).scalar() or 0
-    
-    # Total invoices
-    total_invoices = Invoice.query.filter_by(is_deleted=False).count()
-    
-    # Total revenue (all time)
-    total_revenue = db.session.query(func.sum(Invoice.amount)).filter(
-        Invoice.payment_status == 'paid',
-        Invoice.is_deleted == False
-    ).scalar() or 0
-    
-    # Completion rate (completed vs total)
-    total_requests = ServiceRequest.query.filter_by(is_deleted=False).count()
-    completed_requests = ServiceRequest.query.filter_by(status='completed', is_deleted=False).count()
-    completion_rate = round((completed_requests / total_requests * 100) if total_requests > 0 else 0)
+    # Paid revenue per calendar month, read from the revenue_monthly rollup
+    chart_months = last_months(6)
+    revenue_by_month = get_monthly_revenue(chart_months)
+    monthly_revenue = revenue_by_month[chart_months[-1]]
     
     # Average rating
     avg_rating = 4.5  # You can calculate from actual ratings if you have them
     
     # Recent service requests
-    recent_requests = ServiceRequest.query.filter_by(is_deleted=False).order_by(
-        ServiceRequest.created_at.desc()
-    ).limit(10).all()
+    recent_requests = get_recent_requests(10, options=load_options('admin.dashboard'))
     
     # Revenue chart data (last 6 months)
-    revenue_data = []
-    for i in range(5, -1, -1):
-        month_date = datetime.now() - timedelta(days=30*i)
-        month_revenue = db.session.query(func.sum(Invoice.amount)).filter(
-            extract('month', Invoice.created_at) == month_date.month,
-            extract('year', Invoice.created_at) == month_date.year,
-            Invoice.payment_status == 'paid',
-            Invoice.is_deleted == False
-        ).scalar() or 0
-        revenue_data.append({
-            'month': month_date.strftime('%b %Y'),
-            'revenue': float(month_revenue)
-        })
+    revenue_data = [{
+        'month': datetime(year, month, 1).strftime('%b %Y'),
+        'revenue': float(revenue_by_month[(year, month)])
+    } for year, month in chart_months]
     
     return render_template('admin/dashboard.html',
-                         total_vehicles=total_vehicles,
-                         total_customers=total_customers,
+                         total_vehicles=stats.total_vehicles,
+                         total_customers=stats.total_customers,
                          today_requests=today_requests,
-                         pending_requests=pending_requests,
-                         in_progress=in_progress,
+                         pending_requests=stats.pending_requests,
+                         in_progress=stats.in_progress_requests,
                          monthly_revenue=float(monthly_revenue),
-                         pending_payments=float(pending_payments),
-                         total_invoices=total_invoices,
-                         total_revenue=f"₹{total_revenue:,.0f}",
-                         completion_rate=completion_rate,
+                         pending_payments=float(stats.pending_payments),
+                         total_invoices=stats.total_invoices,
+                         total_revenue=f"₹{stats.total_revenue:,.0f}",
+                         completion_rate=stats.completion_rate,
                          avg_rating=avg_rating,
                          recent_requests=recent_requests,
                          revenue_data=revenue_data)
@@ -110,87 +80,97 @@ def dashboard():
 @admin_required
 def requests():
     status_filter = request.args.get('status', 'all')
-    query = ServiceRequest.query.filter_by(is_deleted=False)
+    query = ServiceRequest.query.options(*load_options('admin.requests'))
     
     if status_filter != 'all':
         query = query.filter_by(status=status_filter)
     
-    requests = query.order_by(ServiceRequest.created_at.desc()).all()
-    return render_template('admin/requests.html', requests=requests, status_filter=status_filter)
+    page = keyset_paginate(query, ServiceRequest)
+    return render_template('admin/requests.html', requests=page.items, page=page, status_filter=status_filter,
+                         status_counts=get_request_status_counts())
+
+@bp.route('/requests/status-counts')
+@login_required
+@admin_required
+def request_status_counts():
+    """Live service request counts per status, as JSON"""
+    return jsonify(get_request_status_counts())
+
+@bp.route('/cache-stats')
+@login_required
+@admin_required
+def cache_stats():
+    """Size and hit/miss counters of this worker's in-process caches and write queue, as JSON"""
+    return jsonify({
+        'users': user_cache_stats(),
+        'vehicle_summaries': summary_cache_stats(),
+        'write_queue': write_queue_stats(),
+    })
 
 @bp.route('/vehicles')
 @login_required
 @admin_required
 def vehicles():
-    vehicles = Vehicle.query.filter_by(is_deleted=False).order_by(Vehicle.created_at.desc()).all()
-    return render_template('admin/vehicles.html', vehicles=vehicles)
+    query, columns = vehicle_totals_query()
+    sort, sort_column, descending = get_sort(columns)
+    query = query.options(*load_options('admin.vehicles'))
+    page = keyset_paginate(query, Vehicle, sort_column=sort_column, descending=descending)
+    health_scores = get_health_scores([row.Vehicle.id for row in page.items])
+    return render_template('admin/vehicles.html', vehicles=page.items, page=page, health_scores=health_scores,
+                         sort=sort, descending=descending, never=NEVER,
+                         total_vehicles=get_dashboard_stats().total_vehicles)
 
 @bp.route('/vehicles/<int:vehicle_id>')
 @login_required
 @admin_required
 def view_vehicle(vehicle_id):
     vehicle = Vehicle.query.get_or_404(vehicle_id)
-    if vehicle.is_deleted:
-        flash('Vehicle not found.', 'error')
-        return redirect(url_for('admin.vehicles'))
-    service_records = ServiceRecord.query.filter_by(vehicle_id=vehicle_id, is_deleted=False).all()
+    service_records = ServiceRecord.query.filter_by(vehicle_id=vehicle_id).all()
     return render_template('admin/vehicle_view.html', vehicle=vehicle, service_records=service_records, now=datetime.now)
 
 @bp.route('/customers')
 @login_required
 @admin_required
 def customers():
-    customers = User.query.filter_by(role='customer', is_deleted=False).order_by(User.created_at.desc()).all()
-    return render_template('admin/customers.html', customers=customers)
+    query, columns = customer_totals_query()
+    sort, sort_column, descending = get_sort(columns)
+    page = keyset_paginate(query, User, sort_column=sort_column, descending=descending)
+    return render_template('admin/customers.html', customers=page.items, page=page,
+                         sort=sort, descending=descending, never=NEVER,
+                         total_customers=get_dashboard_stats().total_customers)
 
 @bp.route('/invoices')
 @login_required
 @admin_required
 def invoices():
     payment_filter = request.args.get('payment', 'all')
-    query = Invoice.query.filter_by(is_deleted=False)
+    query = Invoice.query.options(*load_options('admin.invoices'))
     
     if payment_filter != 'all':
         query = query.filter_by(payment_status=payment_filter)
     
-    invoices = query.order_by(Invoice.created_at.desc()).all()
-    return render_template('admin/invoices.html', invoices=invoices, payment_filter=payment_filter)
+    page = keyset_paginate(query, Invoice)
+    invoice_count, invoice_total = get_invoice_totals(None if payment_filter == 'all' else payment_filter)
+    return render_template('admin/invoices.html', invoices=page.items, page=page, payment_filter=payment_filter,
+                         invoice_count=invoice_count, invoice_total=float(invoice_total))
 
 @bp.route('/reports')
 @login_required
 @admin_required
 def reports():
     # Yearly maintenance cost report
-    current_year = datetime.now().year
-    yearly_data = db.session.query(
-        extract('month', ServiceRecord.service_date).label('month'),
-        func.sum(ServiceRecord.total_amount).label('total')
-    ).filter(
-        extract('year', ServiceRecord.service_date) == current_year,
-        ServiceRecord.is_deleted == False
-    ).group_by(extract('month', ServiceRecord.service_date)).all()
-    
-    monthly_totals = [0] * 12
-    for month, total in yearly_data:
-        monthly_totals[int(month) - 1] = float(total)
+    monthly_totals = get_yearly_maintenance_totals(datetime.now().year)
     
     # Vehicle-wise expense summary
-    vehicle_expenses = db.session.query(
-        Vehicle.registration_number,
-        Vehicle.brand,
-        Vehicle.model,
-        func.sum(ServiceRecord.total_amount).label('total_expense'),
-        func.count(ServiceRecord.id).label('service_count')
-    ).join(
-        ServiceRecord, Vehicle.id == ServiceRecord.vehicle_id
-    ).filter(
-        Vehicle.is_deleted == False,
-        ServiceRecord.is_deleted == False
-    ).group_by(Vehicle.id).order_by(func.sum(ServiceRecord.total_amount).desc()).limit(10).all()
+    vehicle_expenses = get_vehicle_expenses(10)
+    
+    # Vehicles needing attention
+    worst_vehicles = get_worst_vehicles(50, options=load_options('admin.reports'))
     
     return render_template('admin/reports.html',
                          monthly_totals=monthly_totals,
-                         vehicle_expenses=vehicle_expenses)
+                         vehicle_expenses=vehicle_expenses,
+                         worst_vehicles=worst_vehicles)
 
 @bp.route('/invoice/<int:invoice_id>/mark-paid', methods=['GET'])
 @login_required
@@ -199,10 +179,12 @@ def mark_invoice_paid(invoice_id):
     """Mark invoice as paid via cash payment (admin only)"""
     invoice = Invoice.query.get_or_404(invoice_id)
     
-    if invoice.payment_status != 'paid':
-        invoice.payment_status = 'paid'
-        invoice.payment_date = datetime.now()
-        db.session.commit()
+    try:
+        marked = run_write(_mark_invoice_paid, invoice.id, datetime.now())
+    except WritePending:
+        flash(f'Invoice #{invoice.invoice_number} is still being marked as paid. Please check again shortly.', 'info')
+        return redirect(url_for('admin.invoices'))
+    if marked:
         flash(f'✓ Invoice #{invoice.invoice_number} marked as paid (Cash). Amount: ₹{invoice.amount:.2f}', 'success')
     else:
         flash('Invoice is already marked as paid.', 'info')
@@ -0,0 +1,168 @@
+"""
+Archive tier for settled service history.
+
+``service_requests``, ``service_records`` and ``invoices`` only ever grow,
+while history older than a couple of years is hardly read.  ``flask archive
+run --before DATE`` moves settled history created before DATE into the
+``archived_*`` tables, which mirror the live ones and keep the original ids.
+
+A service request is settled when it was
+
+- soft-deleted,
+- cancelled or rejected without ever being serviced, or
+- serviced before DATE and its invoice is paid, cancelled or deleted.
+
+Requests whose invoice is still pending stay where they are.
+
+Requests are moved in id order, ``--batch-size`` at a time together with
+their record and invoice, one transaction per batch: the rows are copied
+with INSERT ... SELECT and the live rows deleted through the session, so the
+dashboard counters, the revenue rollup and the vehicle summaries are
+updated by the usual flush hooks and ``flask stats rebuild`` agrees with
+them.  Dashboard totals therefore cover live history only.  An interrupted
+run leaves whole batches on either side and simply picks up the rest the
+next time.
+
+``service.history`` lists a vehicle's archived records after its live ones,
+and ``service.view_invoice`` falls back to the archive when an invoice id is
+not found in the live table, so old links keep working.  That relies on the
+live tables never reusing an id: they are AUTOINCREMENT tables (migration
+7019450d6e6c), and ``archive_history()`` refuses to run on a database where
+they are not yet.
+"""
+import click
+from datetime import datetime, timedelta
+from flask.cli import AppGroup
+from sqlalchemy import select, insert, literal, or_, and_, text, bindparam
+from sqlalchemy.orm import selectinload
+from app import db
+from app.models import (ServiceRequest, ServiceRecord, Invoice,
+                        ArchivedServiceRequest, ArchivedServiceRecord, ArchivedInvoice)
+from app.softdelete import include_deleted
+
+archive_cli = AppGroup('archive', help='Move settled history to the archive tables.')
+
+CLOSED_STATUSES = ('cancelled', 'rejected')
+SETTLED_PAYMENT_STATUSES = ('paid', 'cancelled')
+
+# Live model -> archive model, parents first
+ARCHIVE_MODELS = (
+    (ServiceRequest, ArchivedServiceRequest),
+    (ServiceRecord, ArchivedServiceRecord),
+    (Invoice, ArchivedInvoice),
+)
+
+
+def tables_reusing_ids():
+    """Live history tables without AUTOINCREMENT, where SQLite may hand out an archived id again"""
+    names = [model.__tablename__ for model, _ in ARCHIVE_MODELS]
+    statement = text("SELECT name, sql FROM sqlite_master WHERE type = 'table' AND name IN :names")
+    definitions = dict(db.session.execute(statement.bindparams(bindparam('names', expanding=True)), {'names': names}).all())
+    return [name for name in names if 'AUTOINCREMENT' not in (definitions.get(name) or '').upper()]
+
+
+def settled_request_ids(before, after_id=0, limit=1000):
+    """Ids of the next settled service requests created before ``before``, in id order"""
+    cutoff = datetime.combine(before, datetime.min.time())
+    settled = or_(
+        ServiceRequest.is_deleted == True,
+        and_(ServiceRecord.id.is_(None), ServiceRequest.status.in_(CLOSED_STATUSES)),
+        and_(
+            ServiceRecord.service_date < before,
+            or_(
+                Invoice.id.is_(None),
+                Invoice.payment_status.in_(SETTLED_PAYMENT_STATUSES),
+                Invoice.is_deleted == True,
+            )
+        )
+    )
+    return db.session.execute(
+        select(ServiceRequest.id)
+        .outerjoin(ServiceRecord, ServiceRecord.service_request_id == ServiceRequest.id)
+        .outerjoin(Invoice, Invoice.service_record_id == ServiceRecord.id)
+        .where(ServiceRequest.id > after_id, ServiceRequest.created_at < cutoff, settled)
+        .order_by(ServiceRequest.id)
+        .limit(limit)
+        .execution_options(include_deleted=True)
+    ).scalars().all()
+
+
+def _copy_rows(model, archive_model, request_ids, now):
+    """INSERT ... SELECT the live rows belonging to ``request_ids`` into the archive table"""
+    table = model.__table__
+    columns = [column.name for column in table.columns]
+    if model is ServiceRequest:
+        rows = select(table).where(table.c.id.in_(request_ids))
+    elif model is ServiceRecord:
+        rows = select(table).where(table.c.service_request_id.in_(request_ids))
+    else:
+        records = ServiceRecord.__table__
+        rows = select(table).join(records, records.c.id == table.c.service_record_id).where(
+            records.c.service_request_id.in_(request_ids)
+        )
+    rows = rows.with_only_columns(*[table.c[name] for name in columns], literal(now).label('archived_at'))
+    db.session.execute(insert(archive_model.__table__).from_select(columns + ['archived_at'], rows))
+
+
+def archive_batch(request_ids):
+    """Move the given service requests with their records and invoices to the archive; commits"""
+    now = datetime.utcnow()
+    with include_deleted():
+        for model, archive_model in ARCHIVE_MODELS:
+            _copy_rows(model, archive_model, request_ids, now)
+        requests = ServiceRequest.query.filter(ServiceRequest.id.in_(request_ids)).options(
+            selectinload(ServiceRequest.service_record).selectinload(ServiceRecord.invoice)
+        ).all()
+        for service_request in requests:
+            # Cascades to the record and its invoice
+            db.session.delete(service_request)
+        db.session.commit()
+    return len(requests)
+
+
+def archive_history(before, batch_size=1000, dry_run=False):
+    """Archive settled history created before ``before``; returns the number of requests moved"""
+    reusing = tables_reusing_ids()
+    if reusing:
+        raise click.ClickException(
+            f"{', '.join(reusing)} may reuse archived ids; run 'flask db upgrade' before archiving"
+        )
+    moved = 0
+    last_id = 0
+    while True:
+        request_ids = settled_request_ids(before, last_id, batch_size)
+        if not request_ids:
+            break
+        last_id = request_ids[-1]
+        if dry_run:
+            moved += len(request_ids)
+            continue
+        moved += archive_batch(request_ids)
+        click.echo(f"Archived {moved} service requests (up to id {last_id})")
+    db.session.rollback()
+    return moved
+
+
+def archived_service_records(vehicle_id):
+    """A vehicle's archived service records, newest first, with their invoices"""
+    return ArchivedServiceRecord.query.filter_by(vehicle_id=vehicle_id).options(
+        selectinload(ArchivedServiceRecord.invoice)
+    ).order_by(ArchivedServiceRecord.service_date.desc()).all()
+
+
+def find_invoice(invoice_id):
+    """Return the live invoice with this id, else the archived one, else None"""
+    return db.session.get(Invoice, invoice_id) or db.session.get(ArchivedInvoice, invoice_id)
+
+
+@archive_cli.command('run')
+@click.option('--before', type=click.DateTime(formats=['%Y-%m-%d']),
+              default=lambda: (datetime.now() - timedelta(days=2 * 365)).strftime('%Y-%m-%d'),
+              show_default='two years ago', help='Archive history created before this date (YYYY-MM-DD).')
+@click.option('--batch-size', default=1000, show_default=True, help='Service requests per transaction.')
+@click.option('--dry-run', is_flag=True, help='Only count what would be archived.')
+def run_command(before, batch_size, dry_run):
+    """Move settled service history to the archive tables."""
+    moved = archive_history(before.date(), batch_size, dry_run)
+    verb = 'would be archived' if dry_run else 'archived'
+    click.echo(f"{moved} settled service requests from before {before.date()} {verb}")
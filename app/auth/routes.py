@@ -12,7 +12,7 @@ def login():
     
     form = LoginForm()
     if form.validate_on_submit():
-        user = User.query.filter_by(username=form.username.data, is_deleted=False).first()
+        user = User.query.filter_by(username=form.username.data).first()
         if user and user.check_password(form.password.data):
             login_user(user, remember=(form.remember_me.data == 'yes'))
             next_page = request.args.get('next')
@@ -0,0 +1,54 @@
+"""
+Small in-process caches.
+
+Each worker process keeps its own copy, so entries carry a TTL that bounds
+how long another worker's write can go unnoticed; writes made in this process
+evict the affected keys immediately.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe LRU cache with a per-entry time to live"""
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'maxsize': self.maxsize,
+                    'hits': self.hits, 'misses': self.misses}
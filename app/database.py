@@ -0,0 +1,89 @@
+"""
+SQLite connection profile and schema upgrades.
+
+Every connection the engine opens to a SQLite database gets the pragmas in
+``SQLITE_PRAGMAS``: WAL so that readers and the single writer stop blocking
+each other, ``synchronous=NORMAL`` to drop the per-commit fsync, a larger
+page cache and memory map, in-memory temp tables and a busy timeout so a
+writer waits for the lock instead of failing with "database is locked".
+
+The pragmas are set from a ``connect`` event hook, so they also apply to
+connections opened lazily after a gunicorn worker forks.  The connection
+pool is sized by ``DATABASE_POOL_OPTIONS``, which is left out for an
+in-memory SQLite database: its single shared connection takes no pool
+options.
+
+The schema is managed by the Alembic migrations in ``migrations/``
+(``flask db upgrade``).  ``upgrade_database()`` also adopts databases that
+``db.create_all()`` built before migrations existed.
+"""
+from flask_migrate import stamp, upgrade
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import make_url
+
+# The revision that matches what db.create_all() used to build, and its tables
+INITIAL_REVISION = '348949f43e9d'
+INITIAL_TABLES = (
+    'users', 'vehicles', 'service_requests', 'service_records', 'invoices', 'documents',
+    'service_reminders', 'dashboard_stats', 'revenue_monthly', 'reminder_sweeps',
+    'vehicle_summaries', 'stored_files',
+)
+
+
+def _pragma_statements(pragmas):
+    return [f"PRAGMA {name}={value}" for name, value in pragmas.items()]
+
+
+def is_memory_database(uri):
+    """True for an in-memory SQLite URI (``sqlite://``, ``:memory:`` or ``mode=memory``)"""
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and (
+        url.database in (None, '', ':memory:') or url.query.get('mode') == 'memory'
+    )
+
+
+def configure_pool(app):
+    """Merge DATABASE_POOL_OPTIONS into the engine options; call before ``db.init_app``"""
+    pool_options = app.config.get('DATABASE_POOL_OPTIONS') or {}
+    if not pool_options or is_memory_database(app.config['SQLALCHEMY_DATABASE_URI']):
+        return
+    # Options set explicitly in SQLALCHEMY_ENGINE_OPTIONS win
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {**pool_options, **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+
+
+def configure_sqlite(app, db):
+    """Install the SQLITE_PRAGMAS connect hook on the app's SQLite engines"""
+    statements = _pragma_statements(app.config.get('SQLITE_PRAGMAS') or {})
+    if not statements:
+        return
+
+    with app.app_context():
+        engines = db.engines.values()
+
+    for engine in engines:
+        if engine.dialect.name != 'sqlite':
+            continue
+
+        @event.listens_for(engine, 'connect')
+        def _set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for statement in statements:
+                    cursor.execute(statement)
+            finally:
+                cursor.close()
+
+
+def sqlite_settings(connection, names=('journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'temp_store', 'busy_timeout')):
+    """Return {pragma: current value} for a SQLAlchemy connection"""
+    return {name: connection.exec_driver_sql(f"PRAGMA {name}").scalar() for name in names}
+
+
+def upgrade_database(db):
+    """Apply pending migrations, stamping an unversioned create_all() database first"""
+    tables = set(inspect(db.engine).get_table_names())
+    if tables and 'alembic_version' not in tables:
+        # Add the initial tables it predates, then adopt it; later tables come from migrations
+        db.metadata.create_all(db.engine, tables=[db.metadata.tables[name] for name in INITIAL_TABLES])
+        stamp(revision=INITIAL_REVISION)
+    upgrade()
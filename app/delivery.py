@@ -0,0 +1,186 @@
+"""
+HTTP delivery of uploaded files.
+
+Every file is sent with a strong ETag (the SHA-256 of its content) and
+honours conditional and Range requests, so a revalidation costs a 304 and a
+large PDF can be resumed or streamed in parts.
+
+Templates link to uploads through ``upload_url()`` / ``document_url()``,
+which add ``?v=<content version>``.  A request whose ``v`` matches the file
+being served is answered with ``Cache-Control: max-age=<1 year>, immutable``
+- the URL changes whenever the content does - so repeat page loads do not
+even revalidate.  Requests without a (current) version get ``no-cache`` and
+revalidate against the ETag instead.
+
+The version of a stored upload is the start of its content key, so a page
+does not read the file at all.  Only legacy flat files and photos that
+``normalize_upload()`` may have rewritten after storing (their key names the
+upload, not the bytes on disk) are hashed; those digests are memoised per
+(path, mtime, size), so a page only stats its files.
+
+With ``FILE_DELIVERY = 'x-accel'`` or ``'x-sendfile'`` the app still runs
+the access check, picks the headers and answers 304s, but the body is left
+to the front proxy (``X-Accel-Redirect`` / ``X-Sendfile``), which then also
+serves Range requests.  Files outside the folders listed in
+``X_ACCEL_LOCATIONS`` are streamed by the app as usual.
+"""
+import hashlib
+import mimetypes
+import os
+from flask import current_app, request, send_file, url_for
+from app.cache import LRUCache
+from app.storage import is_content_key, key_path
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+VERSION_LENGTH = 16
+# Stored as uploaded: save_uploaded_image() normalizes every other image in place
+UNNORMALIZED_EXTENSIONS = {'svg', 'pdf'}
+
+_digests = LRUCache(maxsize=4096, ttl=24 * 60 * 60)
+
+
+def file_digest(path):
+    """Return the SHA-256 hex digest of a file's content"""
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    digest = _digests.get(key)
+    if digest is None:
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha256.update(chunk)
+        digest = sha256.hexdigest()
+        _digests.set(key, digest)
+    return digest
+
+
+def is_normalized(key):
+    """True if the file stored under a content key may have been rewritten since it was stored"""
+    extension = key.rsplit('.', 1)[-1] if '.' in key else ''
+    return extension in current_app.config['ALLOWED_EXTENSIONS'] - UNNORMALIZED_EXTENSIONS
+
+
+def file_version(path, filename=None):
+    """
+    Short content version used as the ?v= cache buster, or None if the file is missing.
+
+    ``filename`` is the stored name; a content key that was not normalized
+    in place is its own version and the file is not read.
+    """
+    if filename and is_content_key(filename) and not is_normalized(filename):
+        return filename[:VERSION_LENGTH] if os.path.isfile(path) else None
+    try:
+        return file_digest(path)[:VERSION_LENGTH]
+    except OSError:
+        return None
+
+
+def find_upload(filename):
+    """Return the path of a stored upload or a legacy one in the vehicle or general uploads folder, or None"""
+    if is_content_key(filename):
+        path = key_path(filename)
+        return path if os.path.isfile(path) else None
+    for folder in (current_app.config.get('VEHICLE_UPLOAD_FOLDER'), current_app.config['UPLOAD_FOLDER']):
+        if folder:
+            path = os.path.join(folder, filename)
+            if os.path.isfile(path):
+                return path
+    return None
+
+
+def document_path(document):
+    """Return the path a document's file is stored at"""
+    if is_content_key(document.file_path):
+        return key_path(document.file_path)
+    basedir = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
+    return os.path.join(basedir, 'static', 'uploads', document.file_path)
+
+
+def is_resizable(filename):
+    """True if ``/uploads/<width>/`` serves resized copies of this file (ALLOWED_IMAGE_EXTENSIONS)"""
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return extension in current_app.config['ALLOWED_IMAGE_EXTENSIONS']
+
+
+def upload_url(filename, size=None):
+    """
+    URL of an uploaded file (or its resized variant) carrying its content version.
+
+    ``size`` is ignored for formats that are not resized (SVG, AVIF, TIFF,
+    icons...), which are linked as uploaded.
+    """
+    path = find_upload(filename)
+    version = file_version(path, filename) if path else None
+    if size and is_resizable(filename):
+        return url_for('main.resized_upload', size=size, filename=filename, v=version)
+    return url_for('main.uploaded_file', filename=filename, v=version)
+
+
+def document_url(document):
+    """URL of a document download carrying its content version"""
+    return url_for('document.download', document_id=document.id, v=file_version(document_path(document), document.file_path))
+
+
+def accel_location(path):
+    """Return the internal nginx URI for a file, or None if its folder is not mapped"""
+    real_path = os.path.realpath(path)
+    for config_key, location in current_app.config['X_ACCEL_LOCATIONS'].items():
+        folder = current_app.config.get(config_key)
+        if not folder:
+            continue
+        folder = os.path.realpath(folder)
+        if os.path.commonpath([real_path, folder]) == folder:
+            relative = os.path.relpath(real_path, folder).replace(os.sep, '/')
+            return location.rstrip('/') + '/' + relative
+    return None
+
+
+def _accel_redirect(path, location, digest, mimetype=None, as_attachment=False, download_name=None):
+    """An empty response telling nginx to send ``location`` itself"""
+    response = current_app.response_class(
+        mimetype=mimetype or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    )
+    if as_attachment:
+        response.headers.set('Content-Disposition', 'attachment', filename=download_name or os.path.basename(path))
+    response.set_etag(digest)
+    response.last_modified = os.path.getmtime(path)
+    response.make_conditional(request)
+    if response.status_code == 200:
+        response.headers['X-Accel-Redirect'] = location
+    return response
+
+
+def send_upload(path, version=None, private=False, **kwargs):
+    """
+    Send a file with a content ETag, conditional/Range handling and cache headers.
+
+    ``version`` is what ``?v=`` must equal for the response to be cacheable
+    as immutable; it defaults to the file's own version.  ``private`` keeps
+    shared caches from storing files behind an access check.  Remaining
+    arguments go to ``flask.send_file``.
+    """
+    digest = file_digest(path)
+    version = version or digest[:VERSION_LENGTH]
+    location = accel_location(path) if current_app.config['FILE_DELIVERY'] == 'x-accel' else None
+    if location:
+        response = _accel_redirect(path, location, digest, **kwargs)
+    else:
+        # USE_X_SENDFILE makes send_file hand the path to the proxy
+        response = send_file(path, etag=digest, conditional=True, **kwargs)
+    # Werkzeug only advertises ranges once a client has asked for one
+    response.accept_ranges = 'bytes'
+
+    cache_control = response.cache_control
+    if request.args.get('v') == version:
+        cache_control.no_cache = None
+        cache_control.max_age = IMMUTABLE_MAX_AGE
+        cache_control.immutable = True
+    else:
+        cache_control.max_age = None
+        cache_control.no_cache = True
+    if private:
+        cache_control.public = False
+        cache_control.private = True
+    else:
+        cache_control.public = True
+    return response
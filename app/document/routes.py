@@ -1,10 +1,14 @@
-from flask import render_template, redirect, url_for, flash, request, send_from_directory, current_app
+from flask import render_template, redirect, url_for, flash, request, current_app
 from flask_login import login_required, current_user
 from app import db
 from app.document import bp
 from app.models import Vehicle, Document
 from app.forms import DocumentForm
-from app.utils import delete_uploaded_image
+from app.utils import delete_file
+from app.reports import expiring_documents_query
+from app.pagination import keyset_paginate
+from app.delivery import document_path, file_version, send_upload
+from app.storage import store
 from datetime import datetime
 import os
 
@@ -19,29 +23,16 @@ def upload(vehicle_id):
     form = DocumentForm()
     if form.validate_on_submit():
         if form.file.data:
-            # Get absolute path to static/uploads folder
-            basedir = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
-            uploads_dir = os.path.join(basedir, 'static', 'uploads')
-            
-            # Create directory if it doesn't exist
-            if not os.path.exists(uploads_dir):
-                os.makedirs(uploads_dir, exist_ok=True)
-            
-            # Save document
-            from werkzeug.utils import secure_filename
-            filename = secure_filename(form.file.data.filename)
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            name, ext = os.path.splitext(filename)
-            unique_filename = f"{name}_{timestamp}{ext}"
-            
-            file_path = os.path.join(uploads_dir, unique_filename)
+            # Save document (identical files are stored once)
+            filename = form.file.data.filename
+            extension = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
             form.file.data.seek(0)
-            form.file.data.save(file_path)
+            key, _, _ = store(form.file.data.stream, extension)
             
             document = Document(
                 vehicle_id=vehicle_id,
                 document_type=form.document_type.data,
-                file_path=unique_filename,  # Store filename only
+                file_path=key,  # Storage key only
                 expiry_date=form.expiry_date.data,
                 description=form.description.data
             )
@@ -63,13 +54,12 @@ def download(document_id):
         flash('Access denied.', 'error')
         return redirect(url_for('main.dashboard'))
     
-    basedir = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
-    file_path = os.path.join(basedir, 'static', 'uploads', document.file_path)
+    file_path = document_path(document)
     
-    if os.path.exists(file_path):
-        directory = os.path.dirname(file_path)
-        filename = os.path.basename(file_path)
-        return send_from_directory(directory, filename, as_attachment=True)
+    if os.path.isfile(file_path):
+        extension = os.path.splitext(document.file_path)[1]
+        download_name = f"{document.document_type}_{vehicle.registration_number}{extension}".replace(' ', '_')
+        return send_upload(file_path, version=file_version(file_path, document.file_path), private=True, as_attachment=True, download_name=download_name)
     else:
         flash('File not found.', 'error')
         return redirect(url_for('vehicle.view', vehicle_id=vehicle.id))
@@ -100,28 +90,18 @@ def delete_document(document_id):
 @bp.route('/expiring')
 @login_required
 def expiring_documents():
-    if current_user.is_admin():
-        vehicles = Vehicle.query.filter_by(is_deleted=False).all()
-    else:
-        vehicles = Vehicle.query.filter_by(user_id=current_user.id, is_deleted=False).all()
+    today = datetime.now().date()
+    query = expiring_documents_query(today, days=30, user_id=None if current_user.is_admin() else current_user.id)
+    page = keyset_paginate(query, Document, sort_column=Document.expiry_date, descending=False)
     
     expiring_docs = []
-    for vehicle in vehicles:
-        docs = Document.query.filter_by(vehicle_id=vehicle.id, is_deleted=False).all()
-        for doc in docs:
-            if doc.is_expiring_soon(days=30) or doc.is_expired():
-                days_until = None
-                if doc.expiry_date:
-                    days_until = (doc.expiry_date - datetime.now().date()).days
-                expiring_docs.append({
-                    'vehicle': vehicle,
-                    'document': doc,
-                    'days_until_expiry': days_until,
-                    'is_expired': doc.is_expired()
-                })
-    
-    # Sort by expiry date
-    expiring_docs.sort(key=lambda x: x['document'].expiry_date or datetime.max.date())
+    for doc in page.items:
+        expiring_docs.append({
+            'vehicle': doc.vehicle,
+            'document': doc,
+            'days_until_expiry': (doc.expiry_date - today).days,
+            'is_expired': doc.expiry_date < today
+        })
     
-    return render_template('document/expiring.html', expiring_docs=expiring_docs)
+    return render_template('document/expiring.html', expiring_docs=expiring_docs, page=page)
 
@@ -20,12 +20,12 @@ class RegistrationForm(FlaskForm):
     submit = SubmitField('Register')
     
     def validate_username(self, username):
-        user = User.query.filter_by(username=username.data, is_deleted=False).first()
+        user = User.query.filter_by(username=username.data).execution_options(include_deleted=True).first()
         if user:
             raise ValidationError('Please use a different username.')
     
     def validate_email(self, email):
-        user = User.query.filter_by(email=email.data, is_deleted=False).first()
+        user = User.query.filter_by(email=email.data).execution_options(include_deleted=True).first()
         if user:
             raise ValidationError('Please use a different email address.')
 
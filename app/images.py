@@ -0,0 +1,313 @@
+"""
+Upload normalization and resized copies of uploaded images.
+
+Uploaded photos are checked with ``verify_image()`` before they are stored
+and then rewritten by ``normalize_upload()`` on a small thread pool
+(``UPLOAD_IMAGE_WORKERS``), so the request returns as soon as the raw bytes
+are on disk.  Normalization applies the EXIF orientation, drops EXIF/XMP and
+text metadata (keeping the ICC colour profile), caps the longest side at
+``UPLOAD_IMAGE_MAX_SIDE`` and re-encodes at ``UPLOAD_IMAGE_QUALITY``,
+replacing the file in place under the same name.
+
+``/uploads/<width>/<filename>`` serves an upload scaled down to one of the
+configured ``IMAGE_WIDTHS`` - as WebP when the browser accepts it, otherwise
+as JPEG for JPEG sources and PNG for the rest - so list pages do not pull
+multi-megabyte photos to draw a thumbnail.
+
+Derivatives are generated on first request and kept in ``IMAGE_CACHE_FOLDER``.
+The cache is bounded by total size (``IMAGE_CACHE_MAX_BYTES``) and evicts the
+least recently served files first.  Cache keys include the source file's
+modification time, so a replaced upload never serves a stale copy.
+
+The folder is shared by every worker process while each keeps its own
+index, so a process that goes over the limit rescans the folder before
+evicting: the limit holds for the folder as a whole, and recency is taken
+from the files' access times, which every hit refreshes.
+
+Within a process, concurrent requests for the same derivative wait on one
+lock and only the first generates it; the lock is dropped once nobody is
+waiting on it any more.  Files are written under a temporary name and
+renamed into place, so separate worker processes racing on the same key at
+worst each render it once and never serve a partial file.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from io import BytesIO
+from PIL import Image, ImageOps
+
+# Formats re-encoded on upload; the rest (GIF animations, icons...) are only verified
+NORMALIZED_FORMATS = {'JPEG', 'PNG', 'WEBP'}
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment', 'photoshop')
+
+# Output format -> (file extension, mimetype)
+FORMATS = {
+    'WEBP': ('.webp', 'image/webp'),
+    'JPEG': ('.jpg', 'image/jpeg'),
+    'PNG': ('.png', 'image/png'),
+}
+
+
+class DiskCache:
+    """Directory of files evicted least recently used first once over ``max_bytes``"""
+
+    def __init__(self, folder, max_bytes):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = None  # name -> size, least recently used first
+        self._lock = threading.Lock()
+        self._key_locks = {}  # name -> [lock, number of threads holding or waiting for it]
+
+    def _load(self):
+        # Rebuild the index from disk (on first use and before evicting), oldest access first
+        os.makedirs(self.folder, exist_ok=True)
+        files = []
+        for entry in os.scandir(self.folder):
+            if entry.is_file() and not entry.name.startswith('.'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    # Evicted by another worker process while scanning
+                    continue
+                files.append((stat.st_atime, entry.name, stat.st_size))
+        self._entries = OrderedDict((name, size) for _, name, size in sorted(files))
+        self.total_bytes = sum(self._entries.values())
+
+    def path(self, name):
+        return os.path.join(self.folder, name)
+
+    def get(self, name):
+        """Return the path of a cached file and mark it recently used, or None"""
+        with self._lock:
+            if self._entries is None:
+                self._load()
+            if name not in self._entries:
+                return None
+            path = self.path(name)
+            if not os.path.exists(path):
+                # Evicted by another worker process
+                self.total_bytes -= self._entries.pop(name)
+                return None
+            self._entries.move_to_end(name)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def put(self, name, data):
+        """Store ``data`` under ``name``, evict as needed and return its path"""
+        os.makedirs(self.folder, exist_ok=True)
+        handle, temp_path = tempfile.mkstemp(dir=self.folder, prefix='.tmp-')
+        with os.fdopen(handle, 'wb') as temp_file:
+            temp_file.write(data)
+        path = self.path(name)
+        os.replace(temp_path, path)
+
+        with self._lock:
+            if self._entries is None:
+                self._load()
+            self.total_bytes -= self._entries.pop(name, 0)
+            self._entries[name] = len(data)
+            self.total_bytes += len(data)
+            if self.total_bytes > self.max_bytes:
+                # Other workers add files this index does not know about
+                self._load()
+            while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                oldest, size = self._entries.popitem(last=False)
+                self.total_bytes -= size
+                try:
+                    os.remove(self.path(oldest))
+                except OSError:
+                    pass
+        return path
+
+    @contextmanager
+    def key_lock(self, name):
+        """Hold the lock serialising generation of one cache entry"""
+        with self._lock:
+            entry = self._key_locks.setdefault(name, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._key_locks[name]
+
+    def get_or_create(self, name, create):
+        """Return the path for ``name``, calling ``create()`` for its bytes at most once"""
+        path = self.get(name)
+        if path:
+            return path
+        with self.key_lock(name):
+            path = self.get(name)
+            if path is None:
+                path = self.put(name, create())
+        return path
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_image_cache(config):
+    """Return the process-wide DiskCache for the configured cache folder"""
+    folder = config['IMAGE_CACHE_FOLDER']
+    with _caches_lock:
+        if folder not in _caches:
+            _caches[folder] = DiskCache(folder, config['IMAGE_CACHE_MAX_BYTES'])
+        return _caches[folder]
+
+
+def output_format(source_path, webp):
+    """Pick the format a derivative is encoded in: WebP if accepted, else JPEG or PNG"""
+    if webp:
+        return 'WEBP'
+    with Image.open(source_path) as image:
+        # Only reads the header
+        return 'JPEG' if image.format == 'JPEG' else 'PNG'
+
+
+def resize_image(source_path, width, fmt, quality=80):
+    """Return ``source_path`` scaled down to at most ``width`` pixels wide, encoded as ``fmt``"""
+    with Image.open(source_path) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+
+        if fmt == 'JPEG':
+            image = image.convert('RGB')
+        elif image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+
+        buffer = BytesIO()
+        options = {'quality': quality} if fmt in ('WEBP', 'JPEG') else {'optimize': True}
+        image.save(buffer, fmt, **options)
+        return buffer.getvalue()
+
+
+def get_resized_image(config, source_path, width, webp):
+    """Return (path, mimetype) of the cached derivative, generating it if needed"""
+    fmt = output_format(source_path, webp)
+    extension, mimetype = FORMATS[fmt]
+    stat = os.stat(source_path)
+    key = f"{os.path.abspath(source_path)}|{stat.st_mtime_ns}|{stat.st_size}|{width}"
+    name = hashlib.sha256(key.encode()).hexdigest()[:40] + extension
+
+    cache = get_image_cache(config)
+    path = cache.get_or_create(name, lambda: resize_image(source_path, width, fmt, config['IMAGE_QUALITY']))
+    return path, mimetype
+
+
+def verify_image(stream):
+    """Return the Pillow format name of an uploaded image, or None if it is not a readable image"""
+    try:
+        with Image.open(stream) as image:
+            fmt = image.format
+            image.verify()
+        return fmt
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        return None
+    finally:
+        stream.seek(0)
+
+
+def _has_metadata(image):
+    return any(image.info.get(key) for key in METADATA_KEYS) or bool(getattr(image, 'text', None))
+
+
+def normalize_image(path, max_side=2560, quality=85):
+    """
+    Rewrite the image at ``path`` upright, without metadata and at most
+    ``max_side`` pixels on its longest side.  Returns (bytes before, bytes after).
+
+    The re-encoded file is only kept if it is smaller or if the original had
+    to change (rotation, size or metadata), so an already compact upload is
+    never inflated by re-encoding.
+    """
+    before = os.path.getsize(path)
+    with Image.open(path) as original:
+        fmt = original.format
+        if fmt not in NORMALIZED_FORMATS:
+            return before, before
+        needs_rewrite = _has_metadata(original) or original.getexif().get(0x0112, 1) != 1
+        icc_profile = original.info.get('icc_profile')
+        image = ImageOps.exif_transpose(original)
+        if max(image.size) > max_side:
+            image.thumbnail((max_side, max_side), Image.LANCZOS)
+            needs_rewrite = True
+
+        options = {'icc_profile': icc_profile} if icc_profile else {}
+        if fmt == 'JPEG':
+            options.update(quality=quality, optimize=True, progressive=True)
+        elif fmt == 'WEBP':
+            options.update(quality=quality)
+        else:
+            options.update(optimize=True)
+        buffer = BytesIO()
+        image.save(buffer, fmt, **options)
+
+    data = buffer.getvalue()
+    if len(data) >= before and not needs_rewrite:
+        return before, before
+    if not os.path.exists(path):
+        # Deleted while we were working on it
+        return before, before
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    with os.fdopen(handle, 'wb') as temp_file:
+        temp_file.write(data)
+    os.replace(temp_path, path)
+    return before, len(data)
+
+
+_ingest_pool = None
+_ingest_pool_lock = threading.Lock()
+
+
+def _get_ingest_pool(workers):
+    global _ingest_pool
+    with _ingest_pool_lock:
+        if _ingest_pool is None:
+            _ingest_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-ingest')
+        return _ingest_pool
+
+
+def normalize_upload(app, path):
+    """
+    Normalize a stored upload on the ingest pool and log the bytes saved.
+
+    Returns the Future, or None when ``UPLOAD_IMAGE_WORKERS`` is 0 and the
+    work was done inline.
+    """
+    config = app.config
+    logger = app.logger
+    name = os.path.basename(path)
+
+    def run():
+        try:
+            before, after = normalize_image(path, config['UPLOAD_IMAGE_MAX_SIDE'], config['UPLOAD_IMAGE_QUALITY'])
+        except Exception as e:
+            logger.error(f"Error normalizing image {name}: {str(e)}")
+            return None
+        logger.info(f"Image normalized: {name} {before} -> {after} bytes ({before - after} bytes saved)")
+        return before, after
+
+    workers = config['UPLOAD_IMAGE_WORKERS']
+    if not workers:
+        run()
+        return None
+    try:
+        return _get_ingest_pool(workers).submit(run)
+    except RuntimeError as e:
+        # Interpreter shutting down; the upload itself is already stored
+        logger.warning(f"Image {name} left unnormalized: {str(e)}")
+        return None
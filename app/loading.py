@@ -0,0 +1,64 @@
+"""
+Per-view eager-loading policy.
+
+Each list view declares the relationship paths its template walks for every
+row; ``load_options(view)`` turns them into loader options so the related
+objects arrive with the page instead of one lazy SELECT per row.
+
+With ``STRICT_LOADING`` enabled (see config.py), every relationship that is
+not declared for the view raises on access instead of quietly issuing a
+query, so new N+1 patterns show up as errors during development.
+"""
+from flask import current_app
+from sqlalchemy.orm import joinedload, defaultload, raiseload
+from app.models import Vehicle, ServiceRequest, ServiceRecord, Invoice
+
+
+def _request_with_customer_and_vehicle():
+    return [(ServiceRequest.customer,), (ServiceRequest.vehicle,)]
+
+
+# view name -> callable returning the relationship paths its template uses.
+# Callables so the backref attributes exist by the time they are resolved.
+VIEW_LOADERS = {
+    'admin.dashboard': _request_with_customer_and_vehicle,
+    'admin.requests': _request_with_customer_and_vehicle,
+    'admin.vehicles': lambda: [(Vehicle.owner,)],
+    'admin.reports': lambda: [(Vehicle.owner,)],
+    'admin.invoices': lambda: [(Invoice.service_record, ServiceRecord.vehicle, Vehicle.owner)],
+    'service.list_requests': lambda: [
+        (ServiceRequest.vehicle,),
+        (ServiceRequest.service_record, ServiceRecord.invoice),
+    ],
+    'service.history': lambda: [(ServiceRecord.invoice,)],
+}
+
+
+def _joined_chain(path):
+    option = joinedload(path[0])
+    for attribute in path[1:]:
+        option = option.joinedload(attribute)
+    return option
+
+
+def _raise_below(path):
+    option = defaultload(path[0])
+    for attribute in path[1:]:
+        option = option.defaultload(attribute)
+    return option.raiseload('*', sql_only=True)
+
+
+def load_options(view):
+    """Return the loader options declared for a view"""
+    paths = VIEW_LOADERS[view]()
+    options = [_joined_chain(path) for path in paths]
+
+    if current_app.config.get('STRICT_LOADING'):
+        # Anything reachable from the loaded rows that was not declared above
+        # raises instead of lazy loading.
+        options.append(raiseload('*', sql_only=True))
+        for path in paths:
+            for depth in range(1, len(path) + 1):
+                options.append(_raise_below(path[:depth]))
+
+    return options
@@ -1,12 +1,17 @@
-from flask import render_template, redirect, url_for, flash, request, send_from_directory, current_app
+from flask import render_template, redirect, url_for, flash, request, current_app, abort
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
 from app import db
 from app.main import bp
-from app.models import Vehicle, ServiceRequest, ServiceRecord, ServiceReminder, Document
+from app.models import Vehicle, ServiceRequest, ServiceRecord, Document
 from app.utils import calculate_vehicle_health_score
+from app.reminders import ReminderEvaluator
+from app.reports import expiring_documents_query
+from app.images import get_resized_image
+from app.delivery import find_upload, file_version, send_upload, is_resizable
+from PIL import Image
 from datetime import datetime, timedelta
-import os
+from sqlalchemy import func
 
 @bp.route('/')
 def index():
@@ -23,57 +28,60 @@ def dashboard():
         return redirect(url_for('admin.dashboard'))
     
     # Get user's vehicles
-    vehicles = Vehicle.query.filter_by(user_id=current_user.id, is_deleted=False).all()
+    vehicles = Vehicle.query.filter_by(user_id=current_user.id).all()
+    vehicle_ids = [vehicle.id for vehicle in vehicles]
+    vehicles_by_id = {vehicle.id: vehicle for vehicle in vehicles}
+    today = datetime.now().date()
+    
+    # Everything below is one set-based query per widget, however many
+    # vehicles the customer has.
     
     # Get upcoming service reminders
-    reminders = []
-    for vehicle in vehicles:
-        vehicle_reminders = ServiceReminder.query.filter_by(
-            vehicle_id=vehicle.id, 
-            is_deleted=False
-        ).all()
-        for reminder in vehicle_reminders:
-            if reminder.is_due_soon(days=30) or reminder.is_due():
-                reminders.append({
-                    'vehicle': vehicle,
-                    'reminder': reminder,
-                    'is_due': reminder.is_due()
-                })
+    reminders = [{
+        'vehicle': status.vehicle,
+        'reminder': status.reminder,
+        'is_due': status.is_due
+    } for status in ReminderEvaluator(today).evaluate(vehicle_ids, actionable_only=True)]
     
     # Get recent service requests
     recent_requests = ServiceRequest.query.filter_by(
-        user_id=current_user.id,
-        is_deleted=False
+        user_id=current_user.id
     ).order_by(ServiceRequest.created_at.desc()).limit(5).all()
     
-    # Get recent service records
-    recent_services = []
-    for vehicle in vehicles:
-        records = ServiceRecord.query.filter_by(
-            vehicle_id=vehicle.id,
-            is_deleted=False
-        ).order_by(ServiceRecord.service_date.desc()).limit(3).all()
-        recent_services.extend(records)
-    recent_services.sort(key=lambda x: x.service_date, reverse=True)
-    recent_services = recent_services[:5]
+    # Get recent service records (at most 3 per vehicle, 5 overall)
+    ranked_records = db.session.query(
+        ServiceRecord.id.label('id'),
+        func.row_number().over(
+            partition_by=ServiceRecord.vehicle_id,
+            order_by=(ServiceRecord.service_date.desc(), ServiceRecord.id.desc())
+        ).label('rank')
+    ).filter(
+        ServiceRecord.vehicle_id.in_(vehicle_ids),
+        ServiceRecord.is_deleted == False
+    ).subquery()
+    recent_services = ServiceRecord.query.join(
+        ranked_records, ranked_records.c.id == ServiceRecord.id
+    ).filter(
+        ranked_records.c.rank <= 3
+    ).order_by(ServiceRecord.service_date.desc()).limit(5).all()
     
     # Calculate statistics
-    total_expenses = 0
-    for vehicle in vehicles:
-        records = ServiceRecord.query.filter_by(vehicle_id=vehicle.id, is_deleted=False).all()
-        total_expenses += sum(float(record.total_amount) for record in records)
+    total_expenses = float(db.session.query(func.sum(ServiceRecord.total_amount)).filter(
+        ServiceRecord.vehicle_id.in_(vehicle_ids),
+        ServiceRecord.is_deleted == False
+    ).scalar() or 0)
     
     # Get expiring documents
     expiring_docs = []
-    for vehicle in vehicles:
-        docs = Document.query.filter_by(vehicle_id=vehicle.id, is_deleted=False).all()
-        for doc in docs:
-            if doc.is_expiring_soon(days=30):
-                expiring_docs.append({
-                    'vehicle': vehicle,
-                    'document': doc,
-                    'days_until_expiry': (doc.expiry_date - datetime.now().date()).days if doc.expiry_date else None
-                })
+    fleet_docs = expiring_documents_query(
+        today, days=30, vehicle_ids=vehicle_ids, include_expired=False
+    ).order_by(Document.expiry_date, Document.id).all()
+    for doc in fleet_docs:
+        expiring_docs.append({
+            'vehicle': vehicles_by_id[doc.vehicle_id],
+            'document': doc,
+            'days_until_expiry': (doc.expiry_date - today).days
+        })
     
     return render_template('main/dashboard.html',
                          vehicles=vehicles,
@@ -88,29 +96,48 @@ def dashboard():
 def profile():
     from app.forms import ChangePasswordForm
     form = ChangePasswordForm()
+    user = current_user.get_user()
     if form.validate_on_submit():
         # Verify current password
-        if not current_user.check_password(form.current_password.data):
+        if not user.check_password(form.current_password.data):
             flash('Current password is incorrect.', 'error')
         else:
             # Update password
-            current_user.set_password(form.new_password.data)
+            user.set_password(form.new_password.data)
             db.session.commit()
             flash('Your password has been changed successfully!', 'success')
             return redirect(url_for('main.profile'))
-    return render_template('main/profile.html', user=current_user, form=form)
+    return render_template('main/profile.html', user=user, form=form)
 
 @bp.route('/uploads/<path:filename>')
 def uploaded_file(filename):
     """Serve uploaded files - accessible to anyone who has the filename"""
+    filename = secure_filename(filename)
+    path = find_upload(filename)
+    if path is None:
+        current_app.logger.error(f"File not found: {filename}")
+        abort(404)
+    return send_upload(path, version=file_version(path, filename))
+
+@bp.route('/uploads/<int:size>/<path:filename>')
+def resized_upload(size, filename):
+    """Serve an uploaded image scaled down to one of the configured widths"""
+    filename = secure_filename(filename)
+    if size not in current_app.config['IMAGE_WIDTHS'] or not is_resizable(filename):
+        abort(404)
+    
+    source_path = find_upload(filename)
+    if source_path is None:
+        abort(404)
+    
+    webp = any(mimetype == 'image/webp' and quality > 0 for mimetype, quality in request.accept_mimetypes)
     try:
-        # Try vehicle uploads folder first
-        vehicle_folder = current_app.config.get('VEHICLE_UPLOAD_FOLDER')
-        if vehicle_folder and os.path.exists(os.path.join(vehicle_folder, secure_filename(filename))):
-            return send_from_directory(vehicle_folder, secure_filename(filename))
-        # Fall back to general uploads folder
-        return send_from_directory(current_app.config['UPLOAD_FOLDER'], secure_filename(filename))
-    except Exception as e:
-        from flask import abort
-        current_app.logger.error(f"File not found or error: {e}")
+        path, mimetype = get_resized_image(current_app.config, source_path, size, webp)
+    except (OSError, Image.DecompressionBombError) as e:
+        current_app.logger.error(f"Could not resize {filename}: {e}")
         abort(404)
+    
+    # Versioned by the source file, which is what upload_url() puts in ?v=
+    response = send_upload(path, version=file_version(source_path, filename), mimetype=mimetype)
+    response.vary.add('Accept')
+    return response
@@ -3,8 +3,16 @@ from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 
+# Partial indexes hold only live rows, which is what every list and report
+# query asks for.  They still end in is_deleted: SQLite only treats a partial
+# index as covering when it holds every column the query mentions.
+LIVE = db.text('is_deleted = 0')
+
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        db.Index('ix_users_role_created_where_live', 'role', 'created_at', 'is_deleted', sqlite_where=LIVE),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False, index=True)
@@ -38,6 +46,10 @@ class User(UserMixin, db.Model):
 
 class Vehicle(db.Model):
     __tablename__ = 'vehicles'
+    __table_args__ = (
+        db.Index('ix_vehicles_created_where_live', 'created_at', 'is_deleted', sqlite_where=LIVE),
+        db.Index('ix_vehicles_user_created_where_live', 'user_id', 'created_at', 'is_deleted', sqlite_where=LIVE),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
@@ -63,6 +75,13 @@ class Vehicle(db.Model):
 
 class ServiceRequest(db.Model):
     __tablename__ = 'service_requests'
+    __table_args__ = (
+        db.Index('ix_service_requests_status_created_where_live', 'status', 'created_at', 'is_deleted', sqlite_where=LIVE),
+        db.Index('ix_service_requests_created_where_live', 'created_at', 'is_deleted', sqlite_where=LIVE),
+        db.Index('ix_service_requests_user_created_where_live', 'user_id', 'created_at', 'is_deleted', sqlite_where=LIVE),
+        # Ids are never reused, so an archived request's id cannot come back as a live one
+        {'sqlite_autoincrement': True},
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'), nullable=False, index=True)
@@ -86,6 +105,11 @@ class ServiceRequest(db.Model):
 
 class ServiceRecord(db.Model):
     __tablename__ = 'service_records'
+    __table_args__ = (
+        db.Index('ix_service_records_date_where_live', 'service_date', 'total_amount', 'is_deleted', sqlite_where=LIVE),
+        db.Index('ix_service_records_vehicle_where_live', 'vehicle_id', 'total_amount', 'service_date', 'is_deleted', sqlite_where=LIVE),
+        {'sqlite_autoincrement': True},
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     service_request_id = db.Column(db.Integer, db.ForeignKey('service_requests.id'), unique=True, nullable=False, index=True)
@@ -110,6 +134,11 @@ class ServiceRecord(db.Model):
 
 class Invoice(db.Model):
     __tablename__ = 'invoices'
+    __table_args__ = (
+        db.Index('ix_invoices_status_created_where_live', 'payment_status', 'created_at', 'is_deleted', sqlite_where=LIVE),
+        db.Index('ix_invoices_created_where_live', 'created_at', 'is_deleted', sqlite_where=LIVE),
+        {'sqlite_autoincrement': True},
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     service_record_id = db.Column(db.Integer, db.ForeignKey('service_records.id'), unique=True, nullable=False, index=True)
@@ -126,6 +155,9 @@ class Invoice(db.Model):
 
 class Document(db.Model):
     __tablename__ = 'documents'
+    __table_args__ = (
+        db.Index('ix_documents_expiry_where_live', 'expiry_date', 'is_deleted', sqlite_where=LIVE),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'), nullable=False, index=True)
@@ -154,6 +186,9 @@ class Document(db.Model):
 
 class ServiceReminder(db.Model):
     __tablename__ = 'service_reminders'
+    __table_args__ = (
+        db.Index('ix_service_reminders_notify_live', 'is_notified', 'is_deleted'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'), nullable=False, index=True)
@@ -167,11 +202,12 @@ class ServiceReminder(db.Model):
     is_deleted = db.Column(db.Boolean, default=False, nullable=False)
     
     def is_due(self):
+        # For more than a handful of reminders use app.reminders.ReminderEvaluator
         if self.reminder_type in ['date', 'both']:
             if self.next_service_date and datetime.now().date() >= self.next_service_date:
                 return True
         if self.reminder_type in ['km', 'both']:
-            vehicle = Vehicle.query.get(self.vehicle_id)
+            vehicle = self.vehicle
             if vehicle and self.next_service_odometer and vehicle.current_odometer >= self.next_service_odometer:
                 return True
         return False
@@ -187,3 +223,166 @@ class ServiceReminder(db.Model):
     def __repr__(self):
         return f'<ServiceReminder {self.id} - {self.vehicle_id}>'
 
+
+
+class DashboardStats(db.Model):
+    __tablename__ = 'dashboard_stats'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    total_vehicles = db.Column(db.Integer, default=0, nullable=False)
+    total_customers = db.Column(db.Integer, default=0, nullable=False)
+    total_requests = db.Column(db.Integer, default=0, nullable=False)
+    pending_requests = db.Column(db.Integer, default=0, nullable=False)
+    in_progress_requests = db.Column(db.Integer, default=0, nullable=False)
+    completed_requests = db.Column(db.Integer, default=0, nullable=False)
+    total_invoices = db.Column(db.Integer, default=0, nullable=False)
+    pending_payments = db.Column(db.Numeric(14, 2), default=0.00, nullable=False)
+    total_revenue = db.Column(db.Numeric(14, 2), default=0.00, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    @property
+    def completion_rate(self):
+        if not self.total_requests:
+            return 0
+        return round(self.completed_requests / self.total_requests * 100)
+    
+    def __repr__(self):
+        return f'<DashboardStats {self.updated_at}>'
+
+
+class RevenueMonthly(db.Model):
+    __tablename__ = 'revenue_monthly'
+    __table_args__ = (
+        db.UniqueConstraint('year', 'month', 'payment_status', name='uq_revenue_monthly_period_status'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    payment_status = db.Column(db.String(20), nullable=False)
+    invoice_count = db.Column(db.Integer, default=0, nullable=False)
+    total_amount = db.Column(db.Numeric(14, 2), default=0.00, nullable=False)
+    
+    def __repr__(self):
+        return f'<RevenueMonthly {self.year}-{self.month:02d} {self.payment_status}>'
+
+
+class ReminderSweep(db.Model):
+    __tablename__ = 'reminder_sweeps'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    as_of = db.Column(db.Date, nullable=False)
+    status = db.Column(db.String(20), default='running', nullable=False)  # running, completed, abandoned
+    last_reminder_id = db.Column(db.Integer, default=0, nullable=False)  # resume checkpoint
+    due_soon_days = db.Column(db.Integer, default=30, server_default='30', nullable=False)  # kept for a resume
+    notified_count = db.Column(db.Integer, default=0, nullable=False)
+    due_count = db.Column(db.Integer, default=0, nullable=False)
+    due_soon_count = db.Column(db.Integer, default=0, nullable=False)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<ReminderSweep {self.id} - {self.status}>'
+
+
+class VehicleSummary(db.Model):
+    __tablename__ = 'vehicle_summaries'
+    
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'), primary_key=True)
+    health_score = db.Column(db.Integer, nullable=False)
+    total_spent = db.Column(db.Numeric(14, 2), default=0.00, nullable=False)
+    service_count = db.Column(db.Integer, default=0, nullable=False)
+    last_service_date = db.Column(db.Date)
+    next_service_date = db.Column(db.Date)
+    next_service_odometer = db.Column(db.Integer)
+    computed_on = db.Column(db.Date, nullable=False)  # health score depends on today's date
+    
+    def __repr__(self):
+        return f'<VehicleSummary {self.vehicle_id}>'
+
+
+class StoredFile(db.Model):
+    __tablename__ = 'stored_files'
+    
+    key = db.Column(db.String(80), primary_key=True)  # <sha256>.<ext>, see app/storage.py
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, default=0, nullable=False)  # vehicles/documents pointing at it
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<StoredFile {self.key} x{self.ref_count}>'
+
+
+# Settled history moved out of the live tables by ``flask archive run`` (see
+# app/archive.py).  Rows keep their original ids, so links to them still work;
+# the live tables use AUTOINCREMENT so those ids are never handed out again.
+
+class ArchivedServiceRequest(db.Model):
+    __tablename__ = 'archived_service_requests'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    service_type = db.Column(db.String(100), nullable=False)
+    custom_service_description = db.Column(db.Text)
+    preferred_date = db.Column(db.Date, nullable=False)
+    preferred_time = db.Column(db.Time)
+    status = db.Column(db.String(20), nullable=False)
+    admin_notes = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime)
+    is_deleted = db.Column(db.Boolean, default=False, nullable=False)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<ArchivedServiceRequest {self.id} - {self.status}>'
+
+
+class ArchivedServiceRecord(db.Model):
+    __tablename__ = 'archived_service_records'
+    __table_args__ = (
+        db.Index('ix_archived_service_records_vehicle_date', 'vehicle_id', 'service_date'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    service_request_id = db.Column(db.Integer, db.ForeignKey('archived_service_requests.id'), unique=True, nullable=False, index=True)
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicles.id'), nullable=False)
+    service_date = db.Column(db.Date, nullable=False)
+    service_type = db.Column(db.String(100), nullable=False)
+    parts_replaced = db.Column(db.Text)
+    labor_charge = db.Column(db.Numeric(10, 2), nullable=False)
+    additional_cost = db.Column(db.Numeric(10, 2), nullable=False)
+    total_amount = db.Column(db.Numeric(10, 2), nullable=False)
+    service_notes = db.Column(db.Text)
+    odometer_reading = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, nullable=False)
+    is_deleted = db.Column(db.Boolean, default=False, nullable=False)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    # Read-only views matching ServiceRecord's, so the same templates render both
+    vehicle = db.relationship('Vehicle', viewonly=True)
+    service_request = db.relationship('ArchivedServiceRequest', viewonly=True)
+    invoice = db.relationship('ArchivedInvoice', back_populates='service_record', uselist=False, viewonly=True)
+    
+    def __repr__(self):
+        return f'<ArchivedServiceRecord {self.id} - {self.vehicle_id}>'
+
+
+class ArchivedInvoice(db.Model):
+    __tablename__ = 'archived_invoices'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    service_record_id = db.Column(db.Integer, db.ForeignKey('archived_service_records.id'), unique=True, nullable=False, index=True)
+    invoice_number = db.Column(db.String(50), unique=True, nullable=False, index=True)
+    amount = db.Column(db.Numeric(10, 2), nullable=False)
+    payment_status = db.Column(db.String(20), nullable=False)
+    payment_date = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, nullable=False)
+    is_deleted = db.Column(db.Boolean, default=False, nullable=False)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    service_record = db.relationship('ArchivedServiceRecord', back_populates='invoice', viewonly=True)
+    
+    def __repr__(self):
+        return f'<ArchivedInvoice {self.invoice_number}>'
@@ -0,0 +1,153 @@
+"""
+Keyset ("seek") pagination for list pages.
+
+Lists are ordered on (sort column, id) - newest first on created_at by
+default - and pages are addressed by an opaque cursor holding the key of the
+boundary row (``?after=`` for the next page, ``?before=`` for the previous
+one).  The sort column may also be an aggregate selected next to the model
+(see ``get_sort()``), in which case rows are (model, column, ...) tuples.
+Every page is fetched with one index seek plus ``per_page + 1`` rows, so
+deep pages cost the same as the first one.  Page and sort links keep the
+other query arguments (filters, ``per_page``) of the current URL.
+"""
+import base64
+import binascii
+from flask import current_app, request, url_for
+from sqlalchemy import tuple_, literal
+from datetime import datetime
+
+
+class KeysetPage:
+    """One page of results plus the cursors needed to reach its neighbours"""
+
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    @property
+    def next_url(self):
+        return _page_url(after=self.next_cursor) if self.has_next else None
+
+    @property
+    def prev_url(self):
+        return _page_url(before=self.prev_cursor) if self.has_prev else None
+
+
+def encode_cursor(value, row_id):
+    """Encode a (sort value, id) key as a URL-safe token"""
+    text = value.isoformat() if hasattr(value, 'isoformat') else str(value)
+    raw = f"{text}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, python_type=datetime):
+    """Return the (sort value, id) key held by a cursor, or None if it is invalid"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        value, row_id = raw.split('|', 1)
+        parse = getattr(python_type, 'fromisoformat', python_type)
+        return parse(value), int(row_id)
+    except (ValueError, ArithmeticError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+def get_per_page():
+    """Return the page size requested via ?per_page=, clamped to the configured maximum"""
+    per_page = request.args.get('per_page', type=int) or current_app.config['PAGE_SIZE']
+    return max(1, min(per_page, current_app.config['MAX_PAGE_SIZE']))
+
+
+def get_sort(columns):
+    """
+    Return (key, column, descending) for the ?sort= and ?direction= arguments.
+
+    ``columns`` maps sort keys to selected column expressions; an unknown or
+    missing key falls back to (None, None, True), i.e. newest first.
+    """
+    key = request.args.get('sort')
+    if key not in columns:
+        return None, None, True
+    return key, columns[key], request.args.get('direction') != 'asc'
+
+
+def _page_url(**cursor):
+    args = request.args.to_dict()
+    args.pop('after', None)
+    args.pop('before', None)
+    args.update(cursor)
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+
+def sort_url(key, direction):
+    """URL of the current list sorted by ``key`` from its first page, keeping the other arguments"""
+    return _page_url(sort=key, direction=direction)
+
+
+def keyset_paginate(query, model, per_page=None, sort_column=None, descending=True):
+    """
+    Return a KeysetPage for ``query`` ordered by (sort_column, id).
+
+    ``sort_column`` defaults to ``model.created_at`` (newest first); any
+    other column must never be NULL and, unless it is a column of ``model``,
+    must be selected by ``query``.  ``query`` must not be ordered yet; the
+    cursor is read from the current request's ``after``/``before`` arguments.
+    """
+    per_page = per_page or get_per_page()
+    sort_column = sort_column if sort_column is not None else model.created_at
+    python_type = sort_column.type.python_type
+    key = tuple_(sort_column, model.id)
+
+    def boundary(cursor):
+        return tuple_(literal(cursor[0], sort_column.type), literal(cursor[1]))
+
+    def ordered(query, forward):
+        if forward == descending:
+            return query.order_by(sort_column.desc(), model.id.desc())
+        return query.order_by(sort_column.asc(), model.id.asc())
+
+    before = decode_cursor(request.args.get('before'), python_type)
+    after = decode_cursor(request.args.get('after'), python_type)
+
+    if before:
+        condition = key > boundary(before) if descending else key < boundary(before)
+        rows = ordered(query.filter(condition), forward=False).limit(per_page + 1).all()
+        has_prev = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        has_next = True
+    else:
+        if after:
+            condition = key < boundary(after) if descending else key > boundary(after)
+            query = query.filter(condition)
+        rows = ordered(query, forward=True).limit(per_page + 1).all()
+        has_next = len(rows) > per_page
+        items = rows[:per_page]
+        has_prev = after is not None
+
+    def cursor_for(row):
+        if isinstance(row, model):
+            return encode_cursor(getattr(row, sort_column.key), row.id)
+        entity = row._mapping[model]
+        if sort_column in row._mapping:
+            value = row._mapping[sort_column]
+        else:
+            value = getattr(entity, sort_column.key)
+        return encode_cursor(value, entity.id)
+
+    return KeysetPage(
+        items,
+        per_page,
+        next_cursor=cursor_for(items[-1]) if has_next and items else None,
+        prev_cursor=cursor_for(items[0]) if has_prev and items else None
+    )
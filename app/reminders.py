@@ -0,0 +1,191 @@
+"""
+Batch evaluation of service reminders.
+
+``ServiceReminder.is_due()`` looks at one reminder (and its vehicle) at a
+time.  ReminderEvaluator instead joins a whole batch of reminders to their
+vehicles' odometers and computes the due / due-soon flags as SQL expressions,
+so any number of reminders is evaluated in a single query.
+
+``flask reminders sweep`` (meant for cron) walks the due and due-soon
+reminders that have not been notified yet in id order, marks them notified
+batch by batch and records its progress in ``reminder_sweeps``.  Each batch is
+its own transaction and the row holds the last processed id, so an
+interrupted sweep resumes where it stopped and memory stays bounded by the
+batch size.  The row also keeps the sweep's due-soon window: a resumed sweep
+classifies the rest of the fleet with the same window, and asking for a
+different one requires ``--restart``.
+"""
+import click
+from collections import namedtuple
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import and_, or_, case, update
+from datetime import datetime, timedelta
+from app import db
+from app.models import Vehicle, ServiceReminder, ReminderSweep
+
+reminders_cli = AppGroup('reminders', help='Service reminder maintenance.')
+
+DEFAULT_DUE_SOON_DAYS = 30
+
+ReminderStatus = namedtuple('ReminderStatus', [
+    'reminder', 'vehicle', 'is_due', 'is_due_soon', 'days_overdue', 'km_overdue'
+])
+
+
+class ReminderEvaluator:
+    """Evaluate reminders in bulk against a reference date"""
+
+    def __init__(self, today=None, due_soon_days=30):
+        self.today = today or datetime.now().date()
+        self.due_soon_days = due_soon_days
+
+    @property
+    def date_due(self):
+        return and_(
+            ServiceReminder.reminder_type.in_(['date', 'both']),
+            ServiceReminder.next_service_date.isnot(None),
+            ServiceReminder.next_service_date <= self.today
+        )
+
+    @property
+    def km_due(self):
+        return and_(
+            ServiceReminder.reminder_type.in_(['km', 'both']),
+            ServiceReminder.next_service_odometer.isnot(None),
+            ServiceReminder.next_service_odometer != 0,
+            Vehicle.current_odometer >= ServiceReminder.next_service_odometer
+        )
+
+    @property
+    def due(self):
+        return or_(self.date_due, self.km_due)
+
+    @property
+    def due_soon(self):
+        return and_(
+            ServiceReminder.reminder_type.in_(['date', 'both']),
+            ServiceReminder.next_service_date.isnot(None),
+            ServiceReminder.next_service_date >= self.today,
+            ServiceReminder.next_service_date <= self.today + timedelta(days=self.due_soon_days)
+        )
+
+    def query(self, vehicle_ids=None, actionable_only=False):
+        """
+        Build the query returning (reminder, vehicle, is_due, is_due_soon, km_overdue)
+        rows for live reminders, optionally limited to some vehicles and to
+        reminders that are due or due soon.
+        """
+        query = db.session.query(
+            ServiceReminder,
+            Vehicle,
+            case((self.due, True), else_=False).label('is_due'),
+            case((self.due_soon, True), else_=False).label('is_due_soon'),
+            case(
+                (self.km_due, Vehicle.current_odometer - ServiceReminder.next_service_odometer),
+                else_=None
+            ).label('km_overdue')
+        ).join(
+            Vehicle, Vehicle.id == ServiceReminder.vehicle_id
+        ).filter(
+            ServiceReminder.is_deleted == False
+        )
+        if vehicle_ids is not None:
+            query = query.filter(ServiceReminder.vehicle_id.in_(vehicle_ids))
+        if actionable_only:
+            query = query.filter(or_(self.due, self.due_soon))
+        return query
+
+    def status(self, row):
+        """Turn one row of ``query()`` into a ReminderStatus"""
+        reminder, vehicle, is_due, is_due_soon, km_overdue = row
+        days_overdue = None
+        next_date = reminder.next_service_date
+        if reminder.reminder_type in ('date', 'both') and next_date and next_date <= self.today:
+            days_overdue = (self.today - next_date).days
+        return ReminderStatus(reminder, vehicle, bool(is_due), bool(is_due_soon), days_overdue, km_overdue)
+
+    def evaluate(self, vehicle_ids=None, actionable_only=False, order_by=None):
+        """Return a ReminderStatus for every matching reminder"""
+        query = self.query(vehicle_ids, actionable_only)
+        if order_by is not None:
+            query = query.order_by(order_by)
+        return [self.status(row) for row in query.all()]
+
+
+def _sweep_batch(evaluator, after_id, batch_size):
+    """Return (id, is_due) for the next batch of un-notified actionable reminders"""
+    return db.session.query(
+        ServiceReminder.id,
+        case((evaluator.due, True), else_=False)
+    ).join(
+        Vehicle, Vehicle.id == ServiceReminder.vehicle_id
+    ).filter(
+        ServiceReminder.is_notified == False,
+        ServiceReminder.is_deleted == False,
+        ServiceReminder.id > after_id,
+        or_(evaluator.due, evaluator.due_soon)
+    ).order_by(ServiceReminder.id).limit(batch_size).all()
+
+
+def sweep_reminders(batch_size=1000, due_soon_days=None, restart=False):
+    """
+    Mark due and due-soon reminders as notified, resuming an unfinished sweep.
+
+    ``due_soon_days`` defaults to the window of the sweep being resumed (or
+    DEFAULT_DUE_SOON_DAYS for a new one); resuming with a different window
+    raises click.ClickException unless ``restart`` is set.
+    """
+    sweep = ReminderSweep.query.filter_by(status='running').order_by(ReminderSweep.id.desc()).first()
+    if sweep and restart:
+        sweep.status = 'abandoned'
+        sweep.finished_at = datetime.utcnow()
+        sweep = None
+    if sweep is not None and due_soon_days is not None and due_soon_days != sweep.due_soon_days:
+        db.session.rollback()
+        raise click.ClickException(
+            f"Sweep {sweep.id} was started with --days {sweep.due_soon_days}; "
+            f"resume it with the same window or pass --restart"
+        )
+    if sweep is None:
+        sweep = ReminderSweep(as_of=datetime.now().date(), last_reminder_id=0,
+                              due_soon_days=due_soon_days or DEFAULT_DUE_SOON_DAYS)
+        db.session.add(sweep)
+    db.session.commit()
+
+    evaluator = ReminderEvaluator(sweep.as_of, sweep.due_soon_days)
+    while True:
+        rows = _sweep_batch(evaluator, sweep.last_reminder_id, batch_size)
+        if not rows:
+            break
+
+        reminder_ids = [reminder_id for reminder_id, _ in rows]
+        due = sum(1 for _, is_due in rows if is_due)
+        db.session.execute(
+            update(ServiceReminder)
+            .where(ServiceReminder.id.in_(reminder_ids))
+            .values(is_notified=True)
+            .execution_options(synchronize_session=False)
+        )
+        sweep.last_reminder_id = reminder_ids[-1]
+        sweep.notified_count += len(rows)
+        sweep.due_count += due
+        sweep.due_soon_count += len(rows) - due
+        db.session.commit()
+        current_app.logger.info(f"Reminder sweep {sweep.id}: notified {len(rows)} reminders up to id {sweep.last_reminder_id}")
+
+    sweep.status = 'completed'
+    sweep.finished_at = datetime.utcnow()
+    db.session.commit()
+    return sweep
+
+
+@reminders_cli.command('sweep')
+@click.option('--batch-size', default=1000, show_default=True, help='Reminders per transaction.')
+@click.option('--days', type=int, help='Window for "due soon" reminders (default: the resumed sweep\'s, else 30).')
+@click.option('--restart', is_flag=True, help='Abandon an unfinished sweep instead of resuming it.')
+def sweep_command(batch_size, days, restart):
+    """Mark due and due-soon reminders as notified."""
+    sweep = sweep_reminders(batch_size=batch_size, due_soon_days=days, restart=restart)
+    click.echo(f"Sweep {sweep.id} completed: {sweep.notified_count} reminders notified "
+               f"({sweep.due_count} due, {sweep.due_soon_count} due soon)")
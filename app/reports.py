@@ -0,0 +1,387 @@
+"""
+Reporting queries for the dashboards, reports and expiring-documents pages.
+
+Date filters are expressed as half-open ranges (``column >= start AND
+column < end``) rather than ``extract()``/``func.date()`` calls so SQLite can
+seek the composite indexes declared on the models.  ``flask reports explain``
+prints the query plan of every report query and exits non-zero if any of them
+falls back to a full table scan.
+"""
+import sys
+import click
+from flask.cli import AppGroup
+from sqlalchemy import func, extract, case
+from datetime import datetime, date, timedelta
+from app import db
+from sqlalchemy.orm import contains_eager
+from app.models import User, Vehicle, ServiceRequest, ServiceRecord, Invoice, Document
+
+reports_cli = AppGroup('reports', help='Inspect the reporting queries.')
+
+# Sorts before every real date; stands in for "no service yet" in aggregates
+NEVER = date(1, 1, 1)
+
+
+def day_range(day):
+    """Return the [start, end) datetimes covering a calendar day"""
+    start = datetime(day.year, day.month, day.day)
+    return start, start + timedelta(days=1)
+
+
+def year_range(year):
+    """Return the [start, end) dates covering a calendar year"""
+    return date(year, 1, 1), date(year + 1, 1, 1)
+
+
+def today_requests_query(today=None):
+    start, end = day_range(today or datetime.now().date())
+    return db.session.query(func.count(ServiceRequest.id)).filter(
+        ServiceRequest.is_deleted == False,
+        ServiceRequest.created_at >= start,
+        ServiceRequest.created_at < end
+    )
+
+
+def recent_requests_query(limit=10):
+    return ServiceRequest.query.filter_by(is_deleted=False).order_by(
+        ServiceRequest.created_at.desc()
+    ).limit(limit)
+
+
+def yearly_maintenance_query(year):
+    start, end = year_range(year)
+    month = extract('month', ServiceRecord.service_date)
+    return db.session.query(
+        month.label('month'),
+        func.sum(ServiceRecord.total_amount).label('total')
+    ).filter(
+        ServiceRecord.is_deleted == False,
+        ServiceRecord.service_date >= start,
+        ServiceRecord.service_date < end
+    ).group_by(month)
+
+
+def request_status_counts_query():
+    return db.session.query(
+        ServiceRequest.status, func.count(ServiceRequest.id)
+    ).filter(
+        ServiceRequest.is_deleted == False
+    ).group_by(ServiceRequest.status)
+
+
+def expiring_documents_query(today=None, days=30, user_id=None, vehicle_ids=None, include_expired=True):
+    """
+    Live documents expiring within ``days`` (and, unless ``include_expired`` is
+    False, already expired ones) with their vehicles loaded; order by
+    ``Document.expiry_date`` to walk ix_documents_live_expiry.
+    """
+    today = today or datetime.now().date()
+    query = Document.query.join(
+        Document.vehicle
+    ).options(
+        contains_eager(Document.vehicle)
+    ).filter(
+        Document.is_deleted == False,
+        Document.expiry_date <= today + timedelta(days=days),
+        Vehicle.is_deleted == False
+    )
+    if not include_expired:
+        query = query.filter(Document.expiry_date >= today)
+    if user_id is not None:
+        query = query.filter(Vehicle.user_id == user_id)
+    if vehicle_ids is not None:
+        query = query.filter(Document.vehicle_id.in_(vehicle_ids))
+    return query
+
+
+def health_scores_query(today=None, vehicle_ids=None, entity=Vehicle):
+    """
+    (entity, health_score, service_count, last_service_date) for live vehicles,
+    where ``entity`` is the Vehicle model or one of its columns.
+
+    Applies the rules of utils.health_score_from() to every vehicle in one
+    aggregate query: recency buckets become date cut-offs, so the whole fleet
+    is scored by the database in a single pass over
+    ix_service_records_vehicle_where_live.
+    """
+    today = today or datetime.now().date()
+    history = db.session.query(
+        ServiceRecord.vehicle_id.label('vehicle_id'),
+        func.count().label('service_count'),
+        func.max(ServiceRecord.service_date).label('last_service_date')
+    ).filter(
+        ServiceRecord.is_deleted == False
+    )
+    if vehicle_ids is not None:
+        history = history.filter(ServiceRecord.vehicle_id.in_(vehicle_ids))
+    history = history.group_by(ServiceRecord.vehicle_id).subquery()
+
+    service_count = func.coalesce(history.c.service_count, 0)
+    last_service_date = history.c.last_service_date
+    count_score = case((service_count >= 8, 40), else_=service_count * 5)
+    recency_score = case(
+        (last_service_date >= today - timedelta(days=90), 40),
+        (last_service_date >= today - timedelta(days=180), 30),
+        (last_service_date >= today - timedelta(days=365), 20),
+        else_=10
+    )
+    regularity_score = 10
+    health_score = case(
+        (last_service_date.is_(None), 50),
+        else_=count_score + recency_score + regularity_score
+    )
+
+    query = db.session.query(
+        entity,
+        health_score.label('health_score'),
+        service_count.label('service_count'),
+        last_service_date.label('last_service_date')
+    ).outerjoin(
+        history, history.c.vehicle_id == Vehicle.id
+    ).filter(
+        Vehicle.is_deleted == False
+    )
+    if vehicle_ids is not None:
+        query = query.filter(Vehicle.id.in_(vehicle_ids))
+    return query
+
+
+def _rounded_sum(column):
+    # Rounded so a sum read back into a cursor compares equal to itself
+    return func.round(func.coalesce(func.sum(column), 0), 2, type_=db.Numeric(10, 2))
+
+
+def _pending_invoices(group_column):
+    """Outstanding (pending) invoice amounts grouped by a vehicle or owner column"""
+    return db.session.query(
+        group_column.label('group_id'),
+        _rounded_sum(Invoice.amount).label('outstanding')
+    ).join(
+        ServiceRecord, ServiceRecord.id == Invoice.service_record_id
+    ).filter(
+        Invoice.is_deleted == False,
+        Invoice.payment_status == 'pending',
+        ServiceRecord.is_deleted == False
+    )
+
+
+def vehicle_totals_query():
+    """
+    Return (query, columns) for the admin vehicle list.
+
+    The query yields (Vehicle, service_count, lifetime_spend,
+    last_service_date, outstanding) for every live vehicle; ``columns`` maps
+    each aggregate's name to its selected expression for sorting.  Records
+    and pending invoices are aggregated in separate grouped subqueries so
+    the LEFT JOINs cannot multiply each other's rows.  Vehicles that were
+    never serviced get NEVER as their last service date.
+    """
+    records = db.session.query(
+        ServiceRecord.vehicle_id.label('group_id'),
+        func.count(ServiceRecord.id).label('service_count'),
+        _rounded_sum(ServiceRecord.total_amount).label('lifetime_spend'),
+        func.max(ServiceRecord.service_date).label('last_service_date')
+    ).filter(
+        ServiceRecord.is_deleted == False
+    ).group_by(ServiceRecord.vehicle_id).subquery()
+    invoices = _pending_invoices(ServiceRecord.vehicle_id).group_by(ServiceRecord.vehicle_id).subquery()
+
+    columns = {
+        'services': func.coalesce(records.c.service_count, 0).label('service_count'),
+        'spend': func.coalesce(records.c.lifetime_spend, 0).label('lifetime_spend'),
+        'last_service': func.coalesce(records.c.last_service_date, NEVER).label('last_service_date'),
+        'outstanding': func.coalesce(invoices.c.outstanding, 0).label('outstanding'),
+    }
+    query = db.session.query(Vehicle, *columns.values()).outerjoin(
+        records, records.c.group_id == Vehicle.id
+    ).outerjoin(
+        invoices, invoices.c.group_id == Vehicle.id
+    ).filter(
+        Vehicle.is_deleted == False
+    )
+    return query, columns
+
+
+def customer_totals_query():
+    """
+    Return (query, columns) for the admin customer list.
+
+    The query yields (User, vehicle_count, visit_count, lifetime_spend,
+    last_visit, outstanding) for every live customer, counting only their
+    live vehicles; see vehicle_totals_query() for ``columns`` and NEVER.
+    """
+    vehicles = db.session.query(
+        Vehicle.user_id.label('group_id'),
+        func.count(Vehicle.id).label('vehicle_count')
+    ).filter(
+        Vehicle.is_deleted == False
+    ).group_by(Vehicle.user_id).subquery()
+    records = db.session.query(
+        Vehicle.user_id.label('group_id'),
+        func.count(ServiceRecord.id).label('visit_count'),
+        _rounded_sum(ServiceRecord.total_amount).label('lifetime_spend'),
+        func.max(ServiceRecord.service_date).label('last_visit')
+    ).join(
+        Vehicle, Vehicle.id == ServiceRecord.vehicle_id
+    ).filter(
+        ServiceRecord.is_deleted == False,
+        Vehicle.is_deleted == False
+    ).group_by(Vehicle.user_id).subquery()
+    invoices = _pending_invoices(Vehicle.user_id).join(
+        Vehicle, Vehicle.id == ServiceRecord.vehicle_id
+    ).filter(
+        Vehicle.is_deleted == False
+    ).group_by(Vehicle.user_id).subquery()
+
+    columns = {
+        'vehicles': func.coalesce(vehicles.c.vehicle_count, 0).label('vehicle_count'),
+        'visits': func.coalesce(records.c.visit_count, 0).label('visit_count'),
+        'spend': func.coalesce(records.c.lifetime_spend, 0).label('lifetime_spend'),
+        'last_visit': func.coalesce(records.c.last_visit, NEVER).label('last_visit'),
+        'outstanding': func.coalesce(invoices.c.outstanding, 0).label('outstanding'),
+    }
+    query = db.session.query(User, *columns.values()).outerjoin(
+        vehicles, vehicles.c.group_id == User.id
+    ).outerjoin(
+        records, records.c.group_id == User.id
+    ).outerjoin(
+        invoices, invoices.c.group_id == User.id
+    ).filter(
+        User.role == 'customer',
+        User.is_deleted == False
+    )
+    return query, columns
+
+
+def vehicle_expenses_query(limit=10):
+    # Aggregate the records first (covered by ix_service_records_live_vehicle)
+    # and only then join the handful of winning vehicles by primary key.
+    totals = db.session.query(
+        ServiceRecord.vehicle_id.label('vehicle_id'),
+        func.sum(ServiceRecord.total_amount).label('total_expense'),
+        func.count(ServiceRecord.id).label('service_count')
+    ).filter(
+        ServiceRecord.is_deleted == False
+    ).group_by(ServiceRecord.vehicle_id).subquery()
+
+    return db.session.query(
+        Vehicle.registration_number,
+        Vehicle.brand,
+        Vehicle.model,
+        totals.c.total_expense,
+        totals.c.service_count
+    ).join(
+        Vehicle, Vehicle.id == totals.c.vehicle_id
+    ).filter(
+        Vehicle.is_deleted == False
+    ).order_by(totals.c.total_expense.desc()).limit(limit)
+
+
+def count_today_requests(today=None):
+    return today_requests_query(today).scalar() or 0
+
+
+def get_recent_requests(limit=10, options=()):
+    return recent_requests_query(limit).options(*options).all()
+
+
+def get_yearly_maintenance_totals(year):
+    """Return a list of 12 monthly service totals for the given year"""
+    monthly_totals = [0] * 12
+    for month, total in yearly_maintenance_query(year).all():
+        monthly_totals[int(month) - 1] = float(total)
+    return monthly_totals
+
+
+def get_request_status_counts():
+    """Return {status: count} for all live service requests"""
+    return dict(request_status_counts_query().all())
+
+
+def get_health_scores(vehicle_ids=None, today=None):
+    """Return {vehicle_id: health score} for the given (or all) live vehicles"""
+    query = health_scores_query(today, vehicle_ids, entity=Vehicle.id)
+    # Just the two columns, straight off the cursor: for a whole fleet, building
+    # ORM rows and parsing last_service_date cost about as much as the query itself
+    statement = query.with_entities(Vehicle.id, query.statement.selected_columns.health_score).statement
+    return dict(db.session.connection().execute(statement).all())
+
+
+def get_worst_vehicles(limit=50, today=None, options=()):
+    """Return the ``limit`` live vehicles with the lowest health scores"""
+    return health_scores_query(today).options(*options).order_by(
+        'health_score', 'last_service_date', Vehicle.id
+    ).limit(limit).all()
+
+
+def get_vehicle_expenses(limit=10):
+    return vehicle_expenses_query(limit).all()
+
+
+def report_queries():
+    """Return the report queries by name, built with representative parameters"""
+    return {
+        'today_requests': today_requests_query(),
+        'recent_requests': recent_requests_query(),
+        'request_status_counts': request_status_counts_query(),
+        'yearly_maintenance': yearly_maintenance_query(datetime.now().year),
+        'vehicle_expenses': vehicle_expenses_query(),
+        'health_scores': health_scores_query(),
+        'vehicle_totals': vehicle_totals_query()[0],
+        'customer_totals': customer_totals_query()[0],
+        'expiring_documents': expiring_documents_query().order_by(Document.expiry_date, Document.id).limit(25),
+    }
+
+
+def explain_query_plan(query):
+    """Return the EXPLAIN QUERY PLAN detail lines for a query"""
+    statement = query.statement.compile(
+        dialect=db.engine.dialect,
+        compile_kwargs={'literal_binds': True}
+    )
+    rows = db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}').all()
+    return [row[3] for row in rows]
+
+
+def full_table_scans(plan):
+    """
+    Return the plan lines that scan a whole table instead of an index.
+
+    SQLite names a table by its alias when the query gives it one (``SCAN
+    v``), so any ``SCAN <name>`` without ``USING ... INDEX`` counts, except
+    for scans of subqueries and CTEs the plan materialized or ran as a
+    co-routine, which are temporary results rather than tables.
+    """
+    temporary = set()
+    scans = []
+    for detail in plan:
+        words = detail.split()
+        if words[:1] in (['MATERIALIZE'], ['CO-ROUTINE']) and len(words) > 1:
+            temporary.add(words[1])
+            continue
+        # SQLite before 3.36 prints "SCAN TABLE <table>", later versions "SCAN <table>"
+        if words[1:2] == ['TABLE']:
+            del words[1]
+        if len(words) < 2 or words[0] != 'SCAN' or 'USING' in words:
+            continue
+        name = words[1]
+        if name in temporary or name.startswith('(') or words[1:3] == ['CONSTANT', 'ROW']:
+            continue
+        scans.append(detail)
+    return scans
+
+
+@reports_cli.command('explain')
+def explain_command():
+    """Print report query plans; fail if any does a full table scan."""
+    failures = 0
+    for name, query in report_queries().items():
+        plan = explain_query_plan(query)
+        scans = full_table_scans(plan)
+        click.echo(f"{'FAIL' if scans else 'ok  '} {name}")
+        for detail in plan:
+            click.echo(f"       {detail}")
+        failures += bool(scans)
+    if failures:
+        click.echo(f"{failures} report queries fall back to a full table scan")
+        sys.exit(1)
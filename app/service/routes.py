@@ -1,20 +1,36 @@
-from flask import render_template, redirect, url_for, flash, request
+from flask import render_template, redirect, url_for, flash, request, abort
 from flask_login import login_required, current_user
 from app import db
 from app.service import bp
 from app.models import Vehicle, ServiceRequest, ServiceRecord, Invoice, ServiceReminder
 from app.forms import ServiceRequestForm, ServiceRecordForm, ServiceStatusUpdateForm, PaymentForm
 from app.utils import generate_invoice_number, calculate_next_service_date, calculate_next_service_odometer
+from app.pagination import keyset_paginate
+from app.loading import load_options
+from app.writes import run_write, WritePending
+from app.archive import archived_service_records, find_invoice
 from datetime import datetime, timedelta
 from decimal import Decimal
 from config import Config
 
+def _create_service_request(**fields):
+    service_request = ServiceRequest(status='pending', **fields)
+    db.session.add(service_request)
+    db.session.flush()
+    return service_request.id
+
+def _update_request_status(request_id, status, admin_notes):
+    service_request = db.session.get(ServiceRequest, request_id)
+    service_request.status = status
+    service_request.admin_notes = admin_notes
+    service_request.updated_at = datetime.utcnow()
+
 @bp.route('/request', methods=['GET', 'POST'])
 @login_required
 def request_service():
     form = ServiceRequestForm()
     # Populate vehicle choices
-    vehicles = Vehicle.query.filter_by(user_id=current_user.id, is_deleted=False).all()
+    vehicles = Vehicle.query.filter_by(user_id=current_user.id).all()
     form.vehicle_id.choices = [(v.id, f"{v.registration_number} - {v.brand} {v.model}") for v in vehicles]
     
     if not form.vehicle_id.choices:
@@ -22,19 +38,21 @@ def request_service():
         return redirect(url_for('vehicle.register'))
     
     if form.validate_on_submit():
-        service_request = ServiceRequest(
-            vehicle_id=form.vehicle_id.data,
-            user_id=current_user.id,
-            service_type=form.service_type.data,
-            custom_service_description=form.custom_service_description.data if form.service_type.data == 'Custom' else None,
-            preferred_date=form.preferred_date.data,
-            preferred_time=form.preferred_time.data,
-            status='pending'
-        )
-        db.session.add(service_request)
-        db.session.commit()
+        try:
+            request_id = run_write(
+                _create_service_request,
+                vehicle_id=form.vehicle_id.data,
+                user_id=current_user.id,
+                service_type=form.service_type.data,
+                custom_service_description=form.custom_service_description.data if form.service_type.data == 'Custom' else None,
+                preferred_date=form.preferred_date.data,
+                preferred_time=form.preferred_time.data
+            )
+        except WritePending:
+            flash('Your service request is still being processed and will appear in your list shortly. Please do not submit it again.', 'info')
+            return redirect(url_for('service.list_requests'))
         flash('Service request submitted successfully!', 'success')
-        return redirect(url_for('service.view_request', request_id=service_request.id))
+        return redirect(url_for('service.view_request', request_id=request_id))
     
     return render_template('service/request.html', form=form)
 
@@ -52,10 +70,11 @@ def view_request(request_id):
 @login_required
 def list_requests():
     if current_user.is_admin():
-        requests = ServiceRequest.query.filter_by(is_deleted=False).order_by(ServiceRequest.created_at.desc()).all()
+        query = ServiceRequest.query
     else:
-        requests = ServiceRequest.query.filter_by(user_id=current_user.id, is_deleted=False).order_by(ServiceRequest.created_at.desc()).all()
-    return render_template('service/list.html', requests=requests)
+        query = ServiceRequest.query.filter_by(user_id=current_user.id)
+    page = keyset_paginate(query.options(*load_options('service.list_requests')), ServiceRequest)
+    return render_template('service/list.html', requests=page.items, page=page)
 
 @bp.route('/update_status/<int:request_id>', methods=['GET', 'POST'])
 @login_required
@@ -68,10 +87,11 @@ def update_status(request_id):
     form = ServiceStatusUpdateForm(obj=service_request)
     
     if form.validate_on_submit():
-        service_request.status = form.status.data
-        service_request.admin_notes = form.admin_notes.data
-        service_request.updated_at = datetime.utcnow()
-        db.session.commit()
+        try:
+            run_write(_update_request_status, request_id, form.status.data, form.admin_notes.data)
+        except WritePending:
+            flash('The status update is still being processed. Please check again shortly.', 'info')
+            return redirect(url_for('service.view_request', request_id=request_id))
         flash('Service status updated successfully!', 'success')
         return redirect(url_for('service.view_request', request_id=request_id))
     
@@ -135,10 +155,9 @@ def complete_service(request_id):
         db.session.add(invoice)
         
         # Create or update service reminder
-        vehicle = Vehicle.query.get(service_request.vehicle_id)
+        vehicle = service_request.vehicle
         last_reminder = ServiceReminder.query.filter_by(
-            vehicle_id=vehicle.id,
-            is_deleted=False
+            vehicle_id=vehicle.id
         ).order_by(ServiceReminder.created_at.desc()).first()
         
         next_service_date = calculate_next_service_date(service_record.service_date, Config.DEFAULT_SERVICE_INTERVAL_DAYS)
@@ -180,16 +199,19 @@ def history(vehicle_id):
         return redirect(url_for('main.dashboard'))
     
     records = ServiceRecord.query.filter_by(
-        vehicle_id=vehicle_id,
-        is_deleted=False
-    ).order_by(ServiceRecord.service_date.desc()).all()
+        vehicle_id=vehicle_id
+    ).options(*load_options('service.history')).order_by(ServiceRecord.service_date.desc()).all()
+    # Settled history moved out by `flask archive run` is older than anything live
+    records += archived_service_records(vehicle_id)
     
     return render_template('service/history.html', records=records, vehicle=vehicle)
 
 @bp.route('/invoice/<int:invoice_id>')
 @login_required
 def view_invoice(invoice_id):
-    invoice = Invoice.query.get_or_404(invoice_id)
+    invoice = find_invoice(invoice_id)
+    if invoice is None:
+        abort(404)
     service_record = invoice.service_record
     
     # Check access
@@ -0,0 +1,88 @@
+"""
+Session-wide soft-delete filter.
+
+Every ORM SELECT run through ``db.session`` - ``Model.query``,
+``get_or_404``, ``session.get``, ``lazy='dynamic'`` collections and lazy
+loads - only returns rows with ``is_deleted = 0`` for the models that have
+the column, via ``with_loader_criteria``.  The criterion is rendered as a
+literal, so SQLite can answer it from the partial ``WHERE is_deleted = 0``
+indexes declared in app/models.py.
+
+Which entities are filtered:
+
+- the entities a statement selects (its "top level" mappers), or every
+  soft-deletable model when it selects none (``Query.count()``,
+  ``select(func.count()).select_from(...)``);
+- the target of a lazy or select-in collection / one-to-one load.
+
+A many-to-one load (``record.vehicle``, ``vehicle.owner``) and entities only
+joined or eager-loaded next to the selected ones are not filtered, so a live
+row always reaches its parent even after the parent was soft-deleted.
+Refreshing the attributes of an object already loaded is never filtered.
+
+Admin and archival code that needs deleted rows opts out explicitly, either
+per statement with ``.execution_options(include_deleted=True)`` or for a
+block with ``with include_deleted():``.
+"""
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.orm import with_loader_criteria
+from sqlalchemy.orm.interfaces import MANYTOONE
+from app import db
+
+_soft_delete_models = None
+
+
+def soft_delete_models():
+    """Mapped classes that have an ``is_deleted`` column"""
+    global _soft_delete_models
+    if _soft_delete_models is None:
+        _soft_delete_models = frozenset(
+            mapper.class_ for mapper in db.Model.registry.mappers if 'is_deleted' in mapper.columns
+        )
+    return _soft_delete_models
+
+
+@contextmanager
+def include_deleted():
+    """Let the queries in this block return soft-deleted rows"""
+    info = db.session.info
+    previous = info.get('include_deleted', False)
+    info['include_deleted'] = True
+    try:
+        yield
+    finally:
+        info['include_deleted'] = previous
+
+
+def _relationship(execute_state):
+    path = execute_state.loader_strategy_path
+    for element in reversed(path.path if path is not None else ()):
+        if hasattr(element, 'direction'):
+            return element
+    return None
+
+
+def _filtered_models(execute_state):
+    models = soft_delete_models()
+    if execute_state.is_relationship_load:
+        relationship = _relationship(execute_state)
+        if relationship is None or relationship.direction is MANYTOONE:
+            return []
+        return [relationship.mapper.class_] if relationship.mapper.class_ in models else []
+    selected = [mapper.class_ for mapper in execute_state.all_mappers]
+    if not selected:
+        return list(models)
+    return [cls for cls in selected if cls in models]
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _exclude_deleted_rows(execute_state):
+    if not execute_state.is_select or execute_state.is_column_load:
+        return
+    if execute_state.execution_options.get('include_deleted') or execute_state.session.info.get('include_deleted'):
+        return
+    execute_state.statement = execute_state.statement.options(*[
+        with_loader_criteria(cls, lambda cls: cls.is_deleted == False, include_aliases=True, propagate_to_loaders=False)
+        for cls in _filtered_models(execute_state)
+    ])
@@ -0,0 +1,281 @@
+"""
+Incrementally maintained counters for the admin dashboard.
+
+Every flush that touches a Vehicle, customer User, ServiceRequest or Invoice
+applies the resulting change to the single ``dashboard_stats`` row in the same
+transaction, so the dashboard reads one row instead of scanning those tables.
+Invoice writes are also folded into the ``revenue_monthly`` rollup, keyed by
+the invoice's creation month and payment status, which feeds the revenue chart.
+Run ``flask stats rebuild`` to recompute both from scratch (e.g. after bulk
+SQL edits or when upgrading an existing database).
+"""
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import event, func, inspect, update, extract
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from datetime import datetime
+from app import db
+from app.models import User, Vehicle, ServiceRequest, Invoice, DashboardStats, RevenueMonthly
+
+STATS_ROW_ID = 1
+
+# Attributes whose values decide what a row contributes to the counters
+TRACKED_ATTRIBUTES = {
+    User: ('role', 'is_deleted'),
+    Vehicle: ('is_deleted',),
+    ServiceRequest: ('status', 'is_deleted'),
+    Invoice: ('payment_status', 'amount', 'created_at', 'is_deleted'),
+}
+
+REQUEST_STATUS_COUNTERS = {
+    'pending': 'pending_requests',
+    'in_progress': 'in_progress_requests',
+    'completed': 'completed_requests',
+}
+
+stats_cli = AppGroup('stats', help='Maintain the admin dashboard statistics.')
+
+
+def _load_previous_value(target, value, oldvalue, initiator):
+    pass
+
+
+# Make sure the previous value is loaded before a tracked attribute is
+# overwritten, otherwise its history cannot tell us what to subtract.
+for _model, _attributes in TRACKED_ATTRIBUTES.items():
+    for _attribute in _attributes:
+        event.listen(getattr(_model, _attribute), 'set', _load_previous_value, active_history=True)
+
+
+def _contribution(model, state):
+    """Return the counters a row with the given attribute values adds to the stats"""
+    if state is None or state.get('is_deleted'):
+        return {}
+
+    if model is User:
+        return {'total_customers': 1} if state.get('role') == 'customer' else {}
+
+    if model is Vehicle:
+        return {'total_vehicles': 1}
+
+    if model is ServiceRequest:
+        counters = {'total_requests': 1}
+        status_counter = REQUEST_STATUS_COUNTERS.get(state.get('status'))
+        if status_counter:
+            counters[status_counter] = 1
+        return counters
+
+    if model is Invoice:
+        counters = {'total_invoices': 1}
+        amount = state.get('amount') or 0
+        if state.get('payment_status') == 'pending':
+            counters['pending_payments'] = amount
+        elif state.get('payment_status') == 'paid':
+            counters['total_revenue'] = amount
+        return counters
+
+    return {}
+
+
+def _monthly_contribution(model, state):
+    """Return the revenue_monthly buckets an invoice with the given values adds to"""
+    if model is not Invoice or state is None or state.get('is_deleted') or not state.get('created_at'):
+        return {}
+    created_at = state['created_at']
+    key = (created_at.year, created_at.month, state.get('payment_status'))
+    return {key: (1, state.get('amount') or 0)}
+
+
+def _current_state(obj):
+    return {attribute: getattr(obj, attribute) for attribute in TRACKED_ATTRIBUTES[type(obj)]}
+
+
+def _committed_state(obj):
+    state = {}
+    attrs = inspect(obj).attrs
+    for attribute in TRACKED_ATTRIBUTES[type(obj)]:
+        history = attrs[attribute].history
+        if history.deleted:
+            state[attribute] = history.deleted[0]
+        elif history.unchanged:
+            state[attribute] = history.unchanged[0]
+        else:
+            state[attribute] = getattr(obj, attribute)
+    return state
+
+
+def _merge(deltas, counters, sign):
+    for counter, value in counters.items():
+        deltas[counter] = deltas.get(counter, 0) + sign * value
+
+
+def _merge_monthly(deltas, buckets, sign):
+    for key, (count, amount) in buckets.items():
+        current_count, current_amount = deltas.get(key, (0, 0))
+        deltas[key] = (current_count + sign * count, current_amount + sign * amount)
+
+
+def _collect_changes(model, old_state, new_state, deltas, monthly_deltas):
+    _merge(deltas, _contribution(model, old_state), -1)
+    _merge(deltas, _contribution(model, new_state), 1)
+    _merge_monthly(monthly_deltas, _monthly_contribution(model, old_state), -1)
+    _merge_monthly(monthly_deltas, _monthly_contribution(model, new_state), 1)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _apply_flush_deltas(session, flush_context):
+    """Fold the rows written by this flush into dashboard_stats and revenue_monthly"""
+    deltas = {}
+    monthly_deltas = {}
+
+    for obj in session.new:
+        if type(obj) in TRACKED_ATTRIBUTES:
+            _collect_changes(type(obj), None, _current_state(obj), deltas, monthly_deltas)
+
+    for obj in session.dirty:
+        if type(obj) in TRACKED_ATTRIBUTES and session.is_modified(obj, include_collections=False):
+            _collect_changes(type(obj), _committed_state(obj), _current_state(obj), deltas, monthly_deltas)
+
+    for obj in session.deleted:
+        if type(obj) in TRACKED_ATTRIBUTES:
+            _collect_changes(type(obj), _committed_state(obj), None, deltas, monthly_deltas)
+
+    connection = session.connection()
+
+    deltas = {counter: value for counter, value in deltas.items() if value}
+    if deltas:
+        values = {counter: getattr(DashboardStats, counter) + value for counter, value in deltas.items()}
+        values['updated_at'] = datetime.utcnow()
+        connection.execute(
+            update(DashboardStats.__table__)
+            .where(DashboardStats.__table__.c.id == STATS_ROW_ID)
+            .values(**values)
+        )
+
+    revenue_table = RevenueMonthly.__table__
+    for (year, month, payment_status), (count, amount) in monthly_deltas.items():
+        if not count and not amount:
+            continue
+        upsert = sqlite_insert(revenue_table).values(
+            year=year, month=month, payment_status=payment_status,
+            invoice_count=count, total_amount=amount
+        )
+        connection.execute(upsert.on_conflict_do_update(
+            index_elements=['year', 'month', 'payment_status'],
+            set_={
+                'invoice_count': revenue_table.c.invoice_count + upsert.excluded.invoice_count,
+                'total_amount': revenue_table.c.total_amount + upsert.excluded.total_amount,
+            }
+        ))
+
+
+def rebuild_dashboard_stats():
+    """Recompute every counter from the base tables and store the result"""
+    stats = db.session.get(DashboardStats, STATS_ROW_ID)
+    if stats is None:
+        stats = DashboardStats(id=STATS_ROW_ID)
+        db.session.add(stats)
+
+    stats.total_vehicles = Vehicle.query.filter_by(is_deleted=False).count()
+    stats.total_customers = User.query.filter_by(role='customer', is_deleted=False).count()
+
+    request_counts = dict(db.session.query(
+        ServiceRequest.status, func.count(ServiceRequest.id)
+    ).filter(
+        ServiceRequest.is_deleted == False
+    ).group_by(ServiceRequest.status).all())
+    stats.total_requests = sum(request_counts.values())
+    stats.pending_requests = request_counts.get('pending', 0)
+    stats.in_progress_requests = request_counts.get('in_progress', 0)
+    stats.completed_requests = request_counts.get('completed', 0)
+
+    invoice_totals = {status: (count, total) for status, count, total in db.session.query(
+        Invoice.payment_status, func.count(Invoice.id), func.sum(Invoice.amount)
+    ).filter(
+        Invoice.is_deleted == False
+    ).group_by(Invoice.payment_status).all()}
+    stats.total_invoices = sum(count for count, _ in invoice_totals.values())
+    stats.pending_payments = invoice_totals.get('pending', (0, 0))[1] or 0
+    stats.total_revenue = invoice_totals.get('paid', (0, 0))[1] or 0
+
+    stats.updated_at = datetime.utcnow()
+    _rebuild_revenue_monthly()
+    db.session.commit()
+    return stats
+
+
+def _rebuild_revenue_monthly():
+    year = extract('year', Invoice.created_at)
+    month = extract('month', Invoice.created_at)
+    rows = db.session.query(
+        year, month, Invoice.payment_status, func.count(Invoice.id), func.sum(Invoice.amount)
+    ).filter(
+        Invoice.is_deleted == False
+    ).group_by(year, month, Invoice.payment_status).all()
+
+    RevenueMonthly.query.delete()
+    for row_year, row_month, payment_status, count, total in rows:
+        db.session.add(RevenueMonthly(
+            year=int(row_year),
+            month=int(row_month),
+            payment_status=payment_status,
+            invoice_count=count,
+            total_amount=total or 0
+        ))
+
+
+def last_months(count, today=None):
+    """Return (year, month) pairs for the last ``count`` calendar months, oldest first"""
+    today = today or datetime.now().date()
+    months = []
+    year, month = today.year, today.month
+    for _ in range(count):
+        months.append((year, month))
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return list(reversed(months))
+
+
+def get_monthly_revenue(months, payment_status='paid'):
+    """Return {(year, month): amount} from the rollup for the given months"""
+    if not months:
+        return {}
+    start_year, start_month = months[0]
+    end_year, end_month = months[-1]
+    period = RevenueMonthly.year * 12 + RevenueMonthly.month
+    rows = RevenueMonthly.query.filter(
+        RevenueMonthly.payment_status == payment_status,
+        period >= start_year * 12 + start_month,
+        period <= end_year * 12 + end_month
+    ).all()
+    totals = {(row.year, row.month): row.total_amount for row in rows}
+    return {key: totals.get(key, 0) for key in months}
+
+
+def get_dashboard_stats():
+    """Return the stats row, building it on first use"""
+    stats = db.session.get(DashboardStats, STATS_ROW_ID)
+    if stats is None:
+        current_app.logger.info('Dashboard stats row missing - rebuilding')
+        stats = rebuild_dashboard_stats()
+    return stats
+
+
+def get_invoice_totals(payment_status=None):
+    """Return (invoice count, total amount) from the rollup, optionally for one payment status"""
+    query = db.session.query(
+        func.coalesce(func.sum(RevenueMonthly.invoice_count), 0),
+        func.coalesce(func.sum(RevenueMonthly.total_amount), 0)
+    )
+    if payment_status:
+        query = query.filter(RevenueMonthly.payment_status == payment_status)
+    return query.one()
+
+
+@stats_cli.command('rebuild')
+def rebuild_command():
+    """Recompute the dashboard statistics from the base tables."""
+    stats = rebuild_dashboard_stats()
+    click.echo(f"Dashboard stats rebuilt: {stats.total_vehicles} vehicles, "
+               f"{stats.total_customers} customers, {stats.total_requests} requests, "
+               f"{stats.total_invoices} invoices")
@@ -0,0 +1,273 @@
+"""
+Content-addressed upload storage.
+
+Vehicle photos and documents are stored once per distinct content under
+``STORAGE_FOLDER/<ab>/<cd>/<sha256>.<ext>``, where the digest is taken of
+the bytes as uploaded while they are streamed to a temporary file.  The
+database keeps only the key (``<sha256>.<ext>``) in ``Vehicle.image_path`` /
+``Document.file_path``; ``stored_files`` counts how many rows reference each
+key.  Uploading content that already exists only bumps the count, and two
+uploads can no longer overwrite each other.  The two-level sharding keeps
+every directory small however many files there are.
+
+Images are normalized in place after the first store (see app/images.py), so
+a photo's key names the upload it came from rather than the bytes on disk.
+
+``release()`` only decrements the count; unreferenced files are removed later
+by ``flask storage gc``, and only once they are older than its grace period.
+Storing content that already exists touches the file, so the grace period
+also covers a deduplicated upload whose row is not committed yet.  Keys that
+do not look like digests are legacy flat filenames and are resolved in the
+old upload folders.
+
+``flask storage gc`` walks the upload folders and the references held by
+live vehicles and documents side by side, both in name order: file names
+come from sorted directory listings and references from the database in
+keyset batches, so the whole run costs one query per batch however many
+files there are.  Files nobody references - including those of
+soft-deleted vehicles and documents - are deleted once they are older than
+the grace period, which also protects uploads whose row is not committed
+yet.  Stored keys that survive get their reference count reconciled.
+"""
+import click
+import hashlib
+import heapq
+import os
+import re
+import tempfile
+import time
+from datetime import datetime
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import update, delete, select, union_all, func
+from sqlalchemy.dialects.sqlite import insert
+from app import db
+from app.models import StoredFile, Vehicle, Document
+
+storage_cli = AppGroup('storage', help='Upload storage maintenance.')
+
+KEY_PATTERN = re.compile(r'^[0-9a-f]{64}(\.[a-z0-9]+)?$')
+CHUNK_SIZE = 64 * 1024
+
+
+def is_content_key(key):
+    return bool(key) and KEY_PATTERN.match(key) is not None
+
+
+def key_path(key, folder=None):
+    """Return the sharded path a content key is stored at"""
+    folder = folder or current_app.config['STORAGE_FOLDER']
+    return os.path.join(folder, key[:2], key[2:4], key)
+
+
+def _stream_to_temp(stream, folder):
+    """Copy a stream to a temporary file in ``folder``; return (temp path, sha256, size)"""
+    os.makedirs(folder, exist_ok=True)
+    sha256 = hashlib.sha256()
+    size = 0
+    handle, temp_path = tempfile.mkstemp(dir=folder, prefix='.tmp-')
+    try:
+        with os.fdopen(handle, 'wb') as temp_file:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                sha256.update(chunk)
+                temp_file.write(chunk)
+                size += len(chunk)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return temp_path, sha256.hexdigest(), size
+
+
+def store(stream, extension):
+    """
+    Store an upload and add one reference to it.
+
+    Returns (key, path, created) where ``created`` is False when identical
+    content was already stored and nothing was written.  The reference is
+    counted in the current session, so it is committed (or rolled back)
+    with the row that points at the key.
+    """
+    folder = current_app.config['STORAGE_FOLDER']
+    extension = re.sub(r'[^a-z0-9]', '', (extension or '').lower())
+    temp_path, digest, size = _stream_to_temp(stream, folder)
+    key = f"{digest}.{extension}" if extension else digest
+    path = key_path(key, folder)
+
+    created = not os.path.exists(path)
+    if not created:
+        try:
+            # Restart gc's grace period so the file outlives the wait for our commit
+            os.utime(path)
+        except FileNotFoundError:
+            # gc removed it in the meantime
+            created = True
+    if created:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp_path, path)
+    else:
+        os.remove(temp_path)
+
+    now = datetime.utcnow()
+    statement = insert(StoredFile).values(key=key, size=size, ref_count=1, created_at=now, updated_at=now)
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=[StoredFile.key],
+        set_={'ref_count': StoredFile.ref_count + 1, 'updated_at': now}
+    ))
+    current_app.logger.info(f"Stored {key} ({size} bytes, {'new' if created else 'deduplicated'})")
+    return key, path, created
+
+
+def release(key):
+    """Drop one reference to a stored key; the file itself is left to ``flask storage gc``"""
+    if not is_content_key(key):
+        return False
+    db.session.execute(
+        update(StoredFile)
+        .where(StoredFile.key == key, StoredFile.ref_count > 0)
+        .values(ref_count=StoredFile.ref_count - 1, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    return True
+
+
+def _folder_files(folder, recursive=False):
+    """Yield (name, path, size, mtime) for the files in a folder in name order"""
+    try:
+        entries = sorted(os.scandir(folder), key=lambda entry: entry.name)
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            if recursive:
+                yield from _folder_files(entry.path, recursive)
+        elif entry.is_file(follow_symlinks=False):
+            # Keep dotfiles (.gitkeep...) but not abandoned upload temp files
+            if entry.name.startswith('.') and not entry.name.startswith('.tmp-'):
+                continue
+            stat = entry.stat()
+            yield entry.name, entry.path, stat.st_size, stat.st_mtime
+
+
+def upload_files():
+    """All upload files, merged into one stream in name order"""
+    config = current_app.config
+    # Sharded names sort by their ab/cd prefix, so a depth-first sorted walk stays in order
+    streams = [_folder_files(config['STORAGE_FOLDER'], recursive=True)]
+    flat_folders = {config.get(key) for key in ('UPLOAD_FOLDER', 'VEHICLE_UPLOAD_FOLDER', 'DOCUMENT_UPLOAD_FOLDER')}
+    for folder in sorted(folder for folder in flat_folders if folder):
+        streams.append(_folder_files(folder))
+    return heapq.merge(*streams)
+
+
+def _references():
+    """Names referenced by live vehicles and documents, one row per reference"""
+    vehicle_images = select(Vehicle.image_path.label('name')).where(
+        Vehicle.is_deleted == False,
+        Vehicle.image_path.isnot(None)
+    )
+    document_files = select(Document.file_path.label('name')).join(
+        Vehicle, Vehicle.id == Document.vehicle_id
+    ).where(
+        Document.is_deleted == False,
+        Vehicle.is_deleted == False
+    )
+    return union_all(vehicle_images, document_files).subquery()
+
+
+def referenced_names(batch_size=1000):
+    """Yield (name, reference count) for every referenced name in name order, batch by batch"""
+    references = _references()
+    name = references.c.name
+    last = ''
+    while True:
+        rows = db.session.execute(
+            select(name, func.count().label('refs'))
+            .where(name > last)
+            .group_by(name)
+            .order_by(name)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        yield from rows
+        last = rows[-1][0]
+
+
+def _sync_ref_counts(counts):
+    """Set the reference counts of surviving stored keys to what is actually referenced"""
+    if not counts:
+        return
+    stale = db.session.execute(
+        select(StoredFile.key, StoredFile.ref_count).where(StoredFile.key.in_(list(counts)))
+    ).all()
+    for key, ref_count in stale:
+        if ref_count != counts[key]:
+            db.session.execute(
+                update(StoredFile).where(StoredFile.key == key).values(ref_count=counts[key])
+                .execution_options(synchronize_session=False)
+            )
+
+
+def collect_garbage(grace_seconds=24 * 60 * 60, dry_run=False, batch_size=1000):
+    """
+    Delete upload files that no live row references and that are older than
+    the grace period.  Returns (files scanned, files removed, bytes reclaimed).
+    """
+    cutoff = time.time() - grace_seconds
+    references = referenced_names(batch_size)
+    reference = next(references, None)
+    scanned = removed = reclaimed = 0
+    removed_keys = []
+    live_counts = {}
+
+    for name, path, size, mtime in upload_files():
+        scanned += 1
+        while reference is not None and reference[0] < name:
+            reference = next(references, None)
+        if reference is not None and reference[0] == name:
+            if is_content_key(name):
+                live_counts[name] = reference[1]
+                if len(live_counts) >= batch_size and not dry_run:
+                    _sync_ref_counts(live_counts)
+                    db.session.commit()
+                    live_counts = {}
+            continue
+        if mtime > cutoff:
+            continue
+
+        removed += 1
+        reclaimed += size
+        current_app.logger.info(f"{'Would remove' if dry_run else 'Removing'} unreferenced upload {path} ({size} bytes)")
+        if dry_run:
+            continue
+        try:
+            os.remove(path)
+        except OSError as e:
+            current_app.logger.warning(f"Could not remove {path}: {e}")
+            continue
+        if is_content_key(name):
+            removed_keys.append(name)
+
+        if len(removed_keys) >= batch_size:
+            db.session.execute(delete(StoredFile).where(StoredFile.key.in_(removed_keys)))
+            db.session.commit()
+            removed_keys = []
+
+    if not dry_run:
+        if removed_keys:
+            db.session.execute(delete(StoredFile).where(StoredFile.key.in_(removed_keys)))
+        _sync_ref_counts(live_counts)
+        db.session.commit()
+    return scanned, removed, reclaimed
+
+
+@storage_cli.command('gc')
+@click.option('--dry-run', is_flag=True, help='Only report what would be removed.')
+@click.option('--grace-hours', default=24, show_default=True, help='Keep unreferenced files younger than this.')
+@click.option('--batch-size', default=1000, show_default=True, help='References fetched per query.')
+def gc_command(dry_run, grace_hours, batch_size):
+    """Remove upload files no live vehicle or document references."""
+    scanned, removed, reclaimed = collect_garbage(grace_hours * 60 * 60, dry_run, batch_size)
+    verb = 'would be reclaimed' if dry_run else 'reclaimed'
+    click.echo(f"Scanned {scanned} files: {removed} unreferenced, {reclaimed} bytes "
+               f"({reclaimed / (1024 * 1024):.1f} MB) {verb}")
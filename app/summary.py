@@ -0,0 +1,147 @@
+"""
+Cached per-vehicle summary for the vehicle page.
+
+The health score, total spend, service count, last service and next due
+reminder are computed once and stored in ``vehicle_summaries``, with an
+in-process LRU in front.  Writing a ServiceRecord or ServiceReminder for a
+vehicle deletes the stored row in the same transaction and drops the LRU
+entry once that transaction has committed (see
+``_invalidate_written_vehicles``); the stored row is also recomputed once a
+day because the health score ages with the last service date.
+
+A missing or stale row is recomputed and stored on its own short connection
+rather than the request session, so a page view never commits anything the
+request had pending.  That transaction takes the write lock before reading
+the history, so a concurrent write cannot slip in between the computation
+and the stored row.
+"""
+from collections import namedtuple
+from flask import current_app
+from sqlalchemy import event, func, delete, insert
+from sqlalchemy.orm import Session
+from datetime import datetime
+from app import db
+from app.cache import LRUCache
+from app.models import ServiceRecord, ServiceReminder, VehicleSummary
+from app.utils import health_score_from
+
+SUMMARY_FIELDS = [
+    'health_score', 'total_spent', 'service_count', 'last_service_date',
+    'next_service_date', 'next_service_odometer', 'computed_on'
+]
+
+# Detached copy of a VehicleSummary row, safe to keep across requests
+Summary = namedtuple('Summary', SUMMARY_FIELDS)
+
+# Writes to these models change what the summary of their vehicle shows
+SUMMARY_SOURCES = (ServiceRecord, ServiceReminder)
+
+_summary_cache = LRUCache(maxsize=1024, ttl=60)
+
+
+def _snapshot(row):
+    return Summary(*(getattr(row, field) for field in SUMMARY_FIELDS))
+
+
+def compute_vehicle_summary(vehicle_id, today=None, session=None):
+    """Compute the summary values for one vehicle from its live history"""
+    today = today or datetime.now().date()
+    session = session or db.session
+    service_count, total_spent, last_service_date = session.query(
+        func.count(ServiceRecord.id),
+        func.coalesce(func.sum(ServiceRecord.total_amount), 0),
+        func.max(ServiceRecord.service_date)
+    ).filter(
+        ServiceRecord.vehicle_id == vehicle_id,
+        ServiceRecord.is_deleted == False
+    ).one()
+
+    reminder = session.query(ServiceReminder).filter_by(
+        vehicle_id=vehicle_id,
+        is_deleted=False
+    ).order_by(ServiceReminder.created_at.desc()).first()
+
+    return {
+        'health_score': health_score_from(service_count, last_service_date, today),
+        'total_spent': total_spent,
+        'service_count': service_count,
+        'last_service_date': last_service_date,
+        'next_service_date': reminder.next_service_date if reminder else None,
+        'next_service_odometer': reminder.next_service_odometer if reminder else None,
+        'computed_on': today,
+    }
+
+
+def store_vehicle_summary(vehicle_id, today=None):
+    """Recompute and store a vehicle's summary in its own transaction; return the Summary"""
+    table = VehicleSummary.__table__
+    with db.engine.begin() as connection:
+        # Deleting first takes the write lock, so the history read below
+        # cannot change before the new row commits
+        connection.execute(delete(table).where(table.c.vehicle_id == vehicle_id))
+        with Session(bind=connection) as session:
+            values = compute_vehicle_summary(vehicle_id, today, session)
+        connection.execute(insert(table).values(vehicle_id=vehicle_id, **values))
+        summary = Summary(**values)
+        # Cached before the commit, so a later write's after_commit always drops it
+        _summary_cache.set(vehicle_id, summary)
+    return summary
+
+
+def get_vehicle_summary(vehicle_id):
+    """Return the Summary for a vehicle from the LRU, the stored row, or a fresh computation"""
+    today = datetime.now().date()
+    summary = _summary_cache.get(vehicle_id)
+    if summary is not None and summary.computed_on == today:
+        return summary
+
+    row = db.session.get(VehicleSummary, vehicle_id)
+    if row is not None and row.computed_on == today:
+        summary = _snapshot(row)
+        _summary_cache.set(vehicle_id, summary)
+        return summary
+
+    try:
+        return store_vehicle_summary(vehicle_id, today)
+    except Exception:
+        # Could not take the write lock in time; serve a fresh computation
+        invalidate_vehicle_summary(vehicle_id)
+        current_app.logger.warning(f"Could not store summary for vehicle {vehicle_id}")
+        return Summary(**compute_vehicle_summary(vehicle_id, today))
+
+
+def summary_cache_stats():
+    """Return the size and hit/miss counters of the in-process summary cache"""
+    return _summary_cache.stats()
+
+
+def invalidate_vehicle_summary(vehicle_id):
+    """Drop the in-process copy of a vehicle's summary"""
+    _summary_cache.delete(vehicle_id)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _invalidate_written_vehicles(session, flush_context):
+    vehicle_ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, SUMMARY_SOURCES) and obj.vehicle_id is not None:
+            vehicle_ids.add(obj.vehicle_id)
+    if not vehicle_ids:
+        return
+
+    session.connection().execute(
+        delete(VehicleSummary.__table__).where(VehicleSummary.__table__.c.vehicle_id.in_(vehicle_ids))
+    )
+    # Until the commit, other requests in this process still read the old history
+    session.info.setdefault('summary_vehicle_ids', set()).update(vehicle_ids)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_committed_vehicles(session):
+    for vehicle_id in session.info.pop('summary_vehicle_ids', ()):
+        invalidate_vehicle_summary(vehicle_id)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _forget_rolled_back_vehicles(session):
+    session.info.pop('summary_vehicle_ids', None)
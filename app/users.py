@@ -0,0 +1,88 @@
+"""
+Cached user identities for Flask-Login.
+
+``load_user`` runs on every authenticated request, so instead of loading the
+User row each time it returns a CachedUser: a detached snapshot of the
+identity and role fields held in an in-process LRU with a short TTL.  Any
+write to a user row - a new password, a role change, a soft delete - drops
+its snapshot once the session commits (see ``_invalidate_committed_users``),
+so the next request sees the change immediately in this process; other
+worker processes pick it up within the TTL.
+
+``current_user`` therefore has no relationships and cannot be modified.
+Code that needs the ORM row (to change the password, for instance) asks for
+it explicitly with ``current_user.get_user()``.
+"""
+from flask_login import UserMixin
+from sqlalchemy import event
+from app import db
+from app.cache import LRUCache
+from app.models import User
+
+SNAPSHOT_FIELDS = ['id', 'username', 'email', 'full_name', 'phone', 'role', 'created_at']
+
+_user_cache = LRUCache(maxsize=4096, ttl=300)
+
+
+class CachedUser(UserMixin):
+    """Read-only identity/role snapshot of a User, used as current_user"""
+
+    def __init__(self, **fields):
+        for field in SNAPSHOT_FIELDS:
+            setattr(self, field, fields[field])
+
+    def is_admin(self):
+        return self.role == 'admin'
+
+    def is_staff(self):
+        return self.role == 'staff'
+
+    def get_user(self):
+        """Return the full User row for this identity"""
+        return db.session.get(User, self.id)
+
+    def __repr__(self):
+        return f'<CachedUser {self.username}>'
+
+
+def load_cached_user(user_id):
+    """Return the CachedUser for a live user id, or None if there is none"""
+    cached = _user_cache.get(user_id)
+    if cached is not None:
+        return cached
+    user = db.session.get(User, user_id)
+    if user is None or user.is_deleted:
+        return None
+    cached = CachedUser(**{field: getattr(user, field) for field in SNAPSHOT_FIELDS})
+    _user_cache.set(user_id, cached)
+    return cached
+
+
+def invalidate_user(user_id):
+    """Drop the in-process snapshot of a user"""
+    _user_cache.delete(user_id)
+
+
+def user_cache_stats():
+    """Return the size and hit/miss counters of the user cache"""
+    return _user_cache.stats()
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_written_users(session, flush_context):
+    user_ids = {obj.id for obj in list(session.dirty) + list(session.deleted)
+                if isinstance(obj, User) and obj.id is not None}
+    if user_ids:
+        # Until the commit, other requests in this process would cache the old row again
+        session.info.setdefault('written_user_ids', set()).update(user_ids)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_committed_users(session):
+    for user_id in session.info.pop('written_user_ids', ()):
+        invalidate_user(user_id)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _forget_rolled_back_users(session):
+    session.info.pop('written_user_ids', None)
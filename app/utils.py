@@ -2,6 +2,8 @@ from flask import current_app
 from werkzeug.utils import secure_filename
 import os
 from datetime import datetime, timedelta
+from app.images import verify_image, normalize_upload
+from app.storage import store, release, is_content_key
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
@@ -10,13 +12,16 @@ def allowed_file(filename):
 
 def save_uploaded_image(file):
     """
-    Save uploaded image to static/uploads/vehicles/ and return filename only
+    Save uploaded image to the content-addressed store and return its key
+    
+    The upload must decode as an image (SVG is stored as is).  New content is
+    normalized in the background - see app/images.py and app/storage.py.
     
     Args:
         file: File object from form.image.data
         
     Returns:
-        filename string (e.g., 'car_20250214_120000.jpg') or None on failure
+        storage key string (e.g., '<sha256>.jpg') or None on failure
     """
     if not file or not file.filename:
         return None
@@ -25,32 +30,20 @@ def save_uploaded_image(file):
         current_app.logger.warning(f"File rejected - invalid extension: {file.filename}")
         return None
     
+    # Reject files that only look like images by their extension
+    extension = file.filename.rsplit('.', 1)[1].lower()
+    if extension != 'svg' and verify_image(file.stream) is None:
+        current_app.logger.warning(f"File rejected - not a readable image: {file.filename}")
+        return None
+    
     try:
-        # Secure the filename
-        filename = secure_filename(file.filename)
-        
-        # Add timestamp to avoid conflicts
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        name, ext = os.path.splitext(filename)
-        unique_filename = f"{name}_{timestamp}{ext}"
-        
-        # Get absolute path to static/uploads/vehicles folder
-        uploads_dir = current_app.config.get('VEHICLE_UPLOAD_FOLDER')
-        
-        # Create directory if it doesn't exist
-        if not os.path.exists(uploads_dir):
-            os.makedirs(uploads_dir, exist_ok=True)
-            current_app.logger.info(f"Created uploads directory: {uploads_dir}")
-        
-        # Full path to save file
-        file_path = os.path.join(uploads_dir, unique_filename)
-        
-        # Save the file
         file.seek(0)
-        file.save(file_path)
+        key, file_path, created = store(file.stream, extension)
+        if created and extension != 'svg':
+            normalize_upload(current_app._get_current_object(), file_path)
         
-        current_app.logger.info(f"Image saved successfully: {unique_filename}")
-        return unique_filename
+        current_app.logger.info(f"Image saved successfully: {key}")
+        return key
         
     except Exception as e:
         current_app.logger.error(f"Error saving image: {str(e)}")
@@ -60,6 +53,8 @@ def delete_uploaded_image(filename):
     """
     Delete uploaded image from static/uploads/vehicles/
     
+    Stored keys only lose a reference; the file goes once nothing uses it.
+    
     Args:
         filename: Filename string stored in database
         
@@ -69,6 +64,9 @@ def delete_uploaded_image(filename):
     if not filename:
         return False
     
+    if is_content_key(filename):
+        return release(filename)
+    
     try:
         uploads_dir = current_app.config.get('VEHICLE_UPLOAD_FOLDER')
         file_path = os.path.join(uploads_dir, secure_filename(filename))
@@ -138,7 +136,15 @@ def calculate_vehicle_health_score(vehicle, service_records):
     if not last_service or not last_service.service_date:
         return 50
     
-    days_since_service = (datetime.now().date() - last_service.service_date).days
+    return health_score_from(total_services, last_service.service_date)
+
+def health_score_from(total_services, last_service_date, today=None):
+    """Health score (0-100) from a vehicle's service count and latest service date"""
+    if not total_services or not last_service_date:
+        return 50
+    
+    today = today or datetime.now().date()
+    days_since_service = (today - last_service_date).days
     
     count_score = min(40, total_services * 5)
     
@@ -155,5 +161,3 @@ def calculate_vehicle_health_score(vehicle, service_records):
     
     total_score = count_score + recency_score + regularity_score
     return min(100, max(0, total_score))
-
-
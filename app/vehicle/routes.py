@@ -5,17 +5,18 @@ from app.vehicle import bp
 from app.models import Vehicle
 from app.forms import VehicleForm
 from app.utils import save_uploaded_image, delete_uploaded_image
+from app.pagination import keyset_paginate
+from sqlalchemy.orm import joinedload
 
 @bp.route('/register', methods=['GET', 'POST'])
 @login_required
 def register():
     form = VehicleForm()
     if form.validate_on_submit():
-        # Check if registration number already exists
+        # Check if registration number already exists (deleted vehicles keep theirs)
         existing = Vehicle.query.filter_by(
-            registration_number=form.registration_number.data,
-            is_deleted=False
-        ).first()
+            registration_number=form.registration_number.data
+        ).execution_options(include_deleted=True).first()
         if existing:
             flash('A vehicle with this registration number already exists.', 'error')
             return render_template('vehicle/register.html', form=form)
@@ -51,52 +52,44 @@ def view(vehicle_id):
         flash('Access denied.', 'error')
         return redirect(url_for('main.dashboard'))
     
-    from app.models import ServiceRecord, ServiceRequest, Document, ServiceReminder
-    from app.utils import calculate_vehicle_health_score
+    from app.models import ServiceRecord, Document, ServiceReminder
+    from app.reminders import ReminderEvaluator
+    from app.summary import get_vehicle_summary
     
-    service_records = ServiceRecord.query.filter_by(
-        vehicle_id=vehicle_id,
-        is_deleted=False
-    ).order_by(ServiceRecord.service_date.desc()).all()
+    # Health score, spend etc. come from the cached summary; the full
+    # service history is paged separately.
+    summary = get_vehicle_summary(vehicle_id)
     
-    service_requests = ServiceRequest.query.filter_by(
-        vehicle_id=vehicle_id,
-        is_deleted=False
-    ).order_by(ServiceRequest.created_at.desc()).all()
+    records_query = ServiceRecord.query.filter_by(
+        vehicle_id=vehicle_id
+    ).options(joinedload(ServiceRecord.invoice))
+    records_page = keyset_paginate(records_query, ServiceRecord, sort_column=ServiceRecord.service_date)
     
     documents = Document.query.filter_by(
-        vehicle_id=vehicle_id,
-        is_deleted=False
+        vehicle_id=vehicle_id
     ).order_by(Document.created_at.desc()).all()
     
-    reminders = ServiceReminder.query.filter_by(
-        vehicle_id=vehicle_id,
-        is_deleted=False
-    ).order_by(ServiceReminder.created_at.desc()).all()
-    
-    # Calculate vehicle health score
-    health_score = calculate_vehicle_health_score(vehicle, service_records)
-    
-    # Calculate total expenses
-    total_expenses = sum(float(record.total_amount) for record in service_records)
+    reminders = ReminderEvaluator().evaluate([vehicle_id], order_by=ServiceReminder.created_at.desc())
     
     return render_template('vehicle/view.html',
                          vehicle=vehicle,
-                         service_records=service_records,
-                         service_requests=service_requests,
+                         summary=summary,
+                         service_records=records_page.items,
+                         page=records_page,
                          documents=documents,
                          reminders=reminders,
-                         health_score=health_score,
-                         total_expenses=total_expenses)
+                         health_score=summary.health_score,
+                         total_expenses=float(summary.total_spent))
 
 @bp.route('/list')
 @login_required
 def list_vehicles():
     if current_user.is_admin():
-        vehicles = Vehicle.query.filter_by(is_deleted=False).all()
+        query = Vehicle.query
     else:
-        vehicles = Vehicle.query.filter_by(user_id=current_user.id, is_deleted=False).all()
-    return render_template('vehicle/list.html', vehicles=vehicles)
+        query = Vehicle.query.filter_by(user_id=current_user.id)
+    page = keyset_paginate(query, Vehicle)
+    return render_template('vehicle/list.html', vehicles=page.items, page=page)
 
 @bp.route('/edit/<int:vehicle_id>', methods=['GET', 'POST'])
 @login_required
@@ -111,9 +104,8 @@ def edit(vehicle_id):
         # Check registration number uniqueness if changed
         if form.registration_number.data != vehicle.registration_number:
             existing = Vehicle.query.filter_by(
-                registration_number=form.registration_number.data,
-                is_deleted=False
-            ).first()
+                registration_number=form.registration_number.data
+            ).execution_options(include_deleted=True).first()
             if existing:
                 flash('A vehicle with this registration number already exists.', 'error')
                 return render_template('vehicle/edit.html', form=form, vehicle=vehicle)
@@ -127,15 +119,17 @@ def edit(vehicle_id):
         
         if form.image.data:
             current_app.logger.info(f"Processing image upload for vehicle {vehicle_id}")
-            # Delete old image if exists
-            if vehicle.image_path:
-                current_app.logger.info(f"Deleting old image: {vehicle.image_path}")
-                delete_uploaded_image(vehicle.image_path)
-            
             # Upload new image
             image_filename = save_uploaded_image(form.image.data)
             if image_filename:
                 current_app.logger.info(f"Image uploaded successfully: {image_filename}")
+                # Delete old image only once the new one is stored
+                if vehicle.image_path and vehicle.image_path != image_filename:
+                    current_app.logger.info(f"Deleting old image: {vehicle.image_path}")
+                    delete_uploaded_image(vehicle.image_path)
+                elif vehicle.image_path == image_filename:
+                    # Same content uploaded again; keep a single reference
+                    delete_uploaded_image(image_filename)
                 vehicle.image_path = image_filename
             else:
                 current_app.logger.warning("Image upload failed")
@@ -0,0 +1,215 @@
+"""
+Group commits for short write transactions.
+
+SQLite has a single writer, so a burst of status updates, payments and new
+requests ends up serialised on the database lock, each request paying for
+its own commit.  With ``WRITE_QUEUE`` enabled, handlers hand those writes to
+``run_write()`` instead of committing themselves: a single writer thread per
+process takes them off a queue, runs whatever has arrived together (up to
+``WRITE_QUEUE_BATCH_SIZE``, waiting at most ``WRITE_QUEUE_MAX_DELAY`` for
+company) in one transaction and commits once for the whole group.
+
+A write is a plain function run against ``db.session`` in the writer
+thread's own app context.  It has no request context, so it takes ids and
+values as arguments (not ``current_user`` or ORM objects from the request
+session) and returns plain values.  Each write is flushed on its own: one
+that raises is dropped from the group and gets its exception, the others
+are re-run and committed without it.
+
+When the lock is held by another process (``SQLITE_BUSY`` / "database is
+locked") the group is rolled back and retried with jittered exponential
+backoff, up to ``WRITE_QUEUE_RETRIES`` times.
+
+``submit_write()`` returns a Future resolved once the group has committed;
+``run_write()`` waits for it and expires the request session, so whatever
+the handler reads next includes its own write.  Without ``WRITE_QUEUE`` the
+same functions run inline in the request session, so handlers do not care
+which mode is on.
+
+If the write has not committed after ``WRITE_QUEUE_TIMEOUT`` seconds,
+``run_write()`` raises ``WritePending``.  The write is still queued and may
+commit later, so handlers tell the user it is still being processed rather
+than that it failed (a retry could apply it twice).
+"""
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+from flask import current_app
+from sqlalchemy.exc import OperationalError
+from app import db
+
+BUSY_MESSAGES = ('database is locked', 'database is busy', 'database table is locked')
+
+
+def is_busy_error(error):
+    """True for the OperationalError SQLite raises when another connection holds the lock"""
+    return isinstance(error, OperationalError) and any(message in str(error.orig) for message in BUSY_MESSAGES)
+
+
+def backoff_delay(attempt, base=0.01, cap=0.5):
+    """Full-jitter exponential backoff: a random delay up to base * 2**attempt, capped"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class WritePending(Exception):
+    """A queued write did not commit within WRITE_QUEUE_TIMEOUT; it may still commit later"""
+
+
+class _Write:
+    __slots__ = ('function', 'args', 'kwargs', 'future')
+
+    def __init__(self, function, args, kwargs):
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+
+
+class WriteQueue:
+    """Single writer thread committing queued writes in groups"""
+
+    def __init__(self, app):
+        self.app = app
+        self.batch_size = app.config['WRITE_QUEUE_BATCH_SIZE']
+        self.max_delay = app.config['WRITE_QUEUE_MAX_DELAY']
+        self.retries = app.config['WRITE_QUEUE_RETRIES']
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.stats = {'writes': 0, 'commits': 0, 'busy_retries': 0, 'failed': 0}
+
+    def _ensure_thread(self):
+        with self._lock:
+            # A forked gunicorn worker inherits the object but not the thread
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='write-queue', daemon=True)
+                self._thread.start()
+
+    def submit(self, function, *args, **kwargs):
+        """Queue ``function(*args, **kwargs)``; return a Future of its result after commit"""
+        self._ensure_thread()
+        write = _Write(function, args, kwargs)
+        self._queue.put(write)
+        return write.future
+
+    def _next_group(self):
+        group = [self._queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(group) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                group.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return group
+
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                group = self._next_group()
+                try:
+                    self._commit_group(group)
+                except BaseException as e:
+                    for write in group:
+                        if not write.future.done():
+                            write.future.set_exception(e)
+                finally:
+                    db.session.remove()
+
+    def _commit_group(self, group):
+        attempt = 0
+        while group:
+            results = []
+            failed = None
+            try:
+                for write in group:
+                    try:
+                        result = write.function(*write.args, **write.kwargs)
+                        db.session.flush()
+                    except Exception as e:
+                        if is_busy_error(e):
+                            raise
+                        failed = (write, e)
+                        break
+                    results.append((write, result))
+                if failed is None:
+                    db.session.commit()
+            except OperationalError as e:
+                db.session.rollback()
+                if not is_busy_error(e) or attempt >= self.retries:
+                    self.stats['failed'] += len(group)
+                    raise
+                self.stats['busy_retries'] += 1
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+                continue
+
+            if failed is not None:
+                # Drop the failing write and run the rest of the group again
+                db.session.rollback()
+                write, error = failed
+                self.stats['failed'] += 1
+                write.future.set_exception(error)
+                group = [other for other in group if other is not write]
+                continue
+
+            self.stats['writes'] += len(results)
+            self.stats['commits'] += 1
+            for write, result in results:
+                write.future.set_result(result)
+            return
+
+
+def _run_inline(function, args, kwargs):
+    future = Future()
+    try:
+        result = function(*args, **kwargs)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        future.set_exception(e)
+    else:
+        future.set_result(result)
+    return future
+
+
+def submit_write(function, *args, **kwargs):
+    """Run a write through the app's write queue (or inline without one); return a Future"""
+    write_queue = current_app.extensions.get('write_queue')
+    if write_queue is None:
+        return _run_inline(function, args, kwargs)
+    return write_queue.submit(function, *args, **kwargs)
+
+
+def run_write(function, *args, **kwargs):
+    """Run a write, wait for its commit and return its result; raises WritePending on timeout"""
+    future = submit_write(function, *args, **kwargs)
+    try:
+        result = future.result(timeout=current_app.config['WRITE_QUEUE_TIMEOUT'])
+    except TimeoutError:
+        current_app.logger.warning(f"{function.__name__} still queued after {current_app.config['WRITE_QUEUE_TIMEOUT']}s")
+        raise WritePending(function.__name__)
+    # Read-your-writes: reload anything the request already had loaded
+    db.session.expire_all()
+    return result
+
+
+def write_queue_stats():
+    """Return the counters of the app's write queue, or None when it is disabled"""
+    write_queue = current_app.extensions.get('write_queue')
+    if write_queue is None:
+        return None
+    return dict(write_queue.stats, queued=write_queue._queue.qsize())
+
+
+def init_write_queue(app):
+    """Create the app's write queue when ``WRITE_QUEUE`` is enabled"""
+    if app.config.get('WRITE_QUEUE'):
+        app.extensions['write_queue'] = WriteQueue(app)
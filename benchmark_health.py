@@ -0,0 +1,114 @@
+"""
+Time fleet-wide health scoring against the per-vehicle loop it replaces.
+
+Builds a throwaway SQLite database with VEHICLES vehicles (0-8 service
+records each), scores the whole fleet with reports.get_health_scores()
+(first call and best of the following ones, against TARGET_MS),
+checks every score against utils.health_score_from() and extrapolates the
+cost of calling calculate_vehicle_health_score() per vehicle from a sample.
+
+    python benchmark_health.py [vehicles]
+"""
+import os
+import sys
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from app import create_app, db
+from app.models import User, Vehicle, ServiceRequest, ServiceRecord
+from app.reports import get_health_scores
+from app.utils import health_score_from, calculate_vehicle_health_score
+from config import Config
+
+VEHICLES = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+BATCH = 5000
+LOOP_SAMPLE = 1000
+SCORING_RUNS = 5
+TARGET_MS = 500
+
+
+def seed(vehicle_count):
+    today = datetime.now().date()
+    now = datetime.utcnow()
+    rng = random.Random(42)
+
+    db.session.execute(db.insert(User), [{
+        'id': 1, 'username': 'bench', 'email': 'bench@example.com', 'password_hash': '-',
+        'full_name': 'Benchmark Owner', 'role': 'customer', 'created_at': now, 'is_deleted': False
+    }])
+
+    history = {}
+    record_id = 0
+    for start in range(1, vehicle_count + 1, BATCH):
+        vehicles, requests, records = [], [], []
+        for vehicle_id in range(start, min(start + BATCH, vehicle_count + 1)):
+            vehicles.append({
+                'id': vehicle_id, 'user_id': 1, 'registration_number': f'BM-{vehicle_id:07d}',
+                'brand': 'Bench', 'model': 'Mark', 'fuel_type': 'Petrol', 'manufacturing_year': 2020,
+                'current_odometer': 0, 'created_at': now, 'is_deleted': False
+            })
+            dates = [today - timedelta(days=rng.randint(0, 800)) for _ in range(rng.randint(0, 8))]
+            history[vehicle_id] = (len(dates), max(dates) if dates else None)
+            for service_date in dates:
+                record_id += 1
+                requests.append({
+                    'id': record_id, 'vehicle_id': vehicle_id, 'user_id': 1, 'service_type': 'Regular Service',
+                    'preferred_date': service_date, 'status': 'completed', 'created_at': now, 'is_deleted': False
+                })
+                records.append({
+                    'id': record_id, 'service_request_id': record_id, 'vehicle_id': vehicle_id,
+                    'service_date': service_date, 'service_type': 'Regular Service', 'labor_charge': 0,
+                    'additional_cost': 0, 'total_amount': 1000, 'created_at': now, 'is_deleted': False
+                })
+        db.session.execute(db.insert(Vehicle), vehicles)
+        if records:
+            db.session.execute(db.insert(ServiceRequest), requests)
+            db.session.execute(db.insert(ServiceRecord), records)
+    db.session.commit()
+    return history, today
+
+
+def run_benchmark():
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+
+    class BenchmarkConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + path
+
+    app = create_app(BenchmarkConfig)
+    try:
+        with app.app_context():
+            db.create_all()
+            started = time.perf_counter()
+            history, today = seed(VEHICLES)
+            print(f'Seeded {VEHICLES} vehicles in {time.perf_counter() - started:.1f}s')
+
+            timings = []
+            for _ in range(SCORING_RUNS):
+                started = time.perf_counter()
+                scores = get_health_scores(today=today)
+                timings.append(time.perf_counter() - started)
+            warm = min(timings[1:] or timings)
+            print(f'Scored {len(scores)} vehicles in {timings[0] * 1000:.0f}ms cold, {warm * 1000:.0f}ms warm '
+                  f'({warm / max(len(scores), 1) * 1e6:.1f}us per vehicle; target {TARGET_MS}ms)')
+
+            sample = Vehicle.query.filter_by(is_deleted=False).limit(LOOP_SAMPLE).all()
+            started = time.perf_counter()
+            for vehicle in sample:
+                calculate_vehicle_health_score(vehicle, vehicle.service_records.filter_by(is_deleted=False))
+            per_vehicle = (time.perf_counter() - started) / max(len(sample), 1)
+            print(f'Per-vehicle loop: {per_vehicle * 1e6:.1f}us per vehicle '
+                  f'(~{per_vehicle * len(scores):.1f}s for the whole fleet)')
+
+            expected = {vehicle_id: health_score_from(count, last, today)
+                        for vehicle_id, (count, last) in history.items()}
+            mismatches = [vehicle_id for vehicle_id, score in expected.items() if scores.get(vehicle_id) != score]
+            print('MISMATCHES:', len(mismatches), mismatches[:10])
+            db.session.remove()
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    run_benchmark()
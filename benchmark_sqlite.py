@@ -0,0 +1,126 @@
+"""
+Compare SQLite throughput with and without the SQLITE_PRAGMAS profile.
+
+Seeds a throwaway database, then runs WORKERS processes (like gunicorn sync
+workers, each with its own app and connection pool) for SECONDS: half of
+them read (dashboard-style counts and recent requests), half write short
+transactions (status updates and new service requests, like
+update_status and request_service).  Each run reports reads/s, writes/s and
+how many operations failed with "database is locked".
+
+    python benchmark_sqlite.py [workers] [seconds]
+"""
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from sqlalchemy.exc import OperationalError
+from app import create_app, db
+from app.models import User, Vehicle, ServiceRequest
+from app.reports import count_today_requests, get_recent_requests, get_request_status_counts
+from config import Config
+
+WORKERS = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+SECONDS = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+VEHICLES = 500
+REQUESTS = 5000
+STATUSES = ['pending', 'approved', 'in_progress', 'completed']
+
+
+def make_config(path, pragmas):
+    class BenchmarkConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + path
+        SQLITE_PRAGMAS = pragmas
+    return BenchmarkConfig
+
+
+def seed(config):
+    app = create_app(config)
+    with app.app_context():
+        db.create_all()
+        now = datetime.utcnow()
+        db.session.execute(db.insert(User), [{
+            'id': 1, 'username': 'bench', 'email': 'bench@example.com', 'password_hash': '-',
+            'full_name': 'Benchmark Owner', 'role': 'customer', 'created_at': now, 'is_deleted': False
+        }])
+        db.session.execute(db.insert(Vehicle), [{
+            'id': i, 'user_id': 1, 'registration_number': f'BM-{i:05d}', 'brand': 'Bench', 'model': 'Mark',
+            'fuel_type': 'Petrol', 'manufacturing_year': 2020, 'current_odometer': 0,
+            'created_at': now, 'is_deleted': False
+        } for i in range(1, VEHICLES + 1)])
+        db.session.execute(db.insert(ServiceRequest), [{
+            'vehicle_id': random.randint(1, VEHICLES), 'user_id': 1, 'service_type': 'Regular Service',
+            'preferred_date': now.date(), 'status': random.choice(STATUSES),
+            'created_at': now - timedelta(minutes=i), 'updated_at': now, 'is_deleted': False
+        } for i in range(REQUESTS)])
+        db.session.commit()
+        db.session.remove()
+        db.engine.dispose()
+
+
+def worker(config, role, deadline, results):
+    app = create_app(config)
+    done = locked = 0
+    rng = random.Random(os.getpid())
+    with app.app_context():
+        while time.time() < deadline:
+            try:
+                if role == 'read':
+                    count_today_requests()
+                    get_request_status_counts()
+                    get_recent_requests(10)
+                    db.session.rollback()
+                else:
+                    request = db.session.get(ServiceRequest, rng.randint(1, REQUESTS))
+                    request.status = rng.choice(STATUSES)
+                    db.session.add(ServiceRequest(
+                        vehicle_id=rng.randint(1, VEHICLES), user_id=1, service_type='Repair',
+                        preferred_date=datetime.utcnow().date()
+                    ))
+                    db.session.commit()
+                done += 1
+            except OperationalError as e:
+                db.session.rollback()
+                if 'locked' not in str(e):
+                    raise
+                locked += 1
+    results.put((role, done, locked))
+
+
+def run(label, pragmas):
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    os.remove(path)
+    config = make_config(path, pragmas)
+    try:
+        seed(config)
+        results = multiprocessing.Queue()
+        deadline = time.time() + SECONDS
+        roles = ['read' if i % 2 == 0 else 'write' for i in range(WORKERS)]
+        processes = [multiprocessing.Process(target=worker, args=(config, role, deadline, results)) for role in roles]
+        for process in processes:
+            process.start()
+        totals = {'read': [0, 0], 'write': [0, 0]}
+        for _ in processes:
+            role, done, locked = results.get()
+            totals[role][0] += done
+            totals[role][1] += locked
+        for process in processes:
+            process.join()
+
+        print(f"{label:<10} reads/s {totals['read'][0] / SECONDS:8.0f}   writes/s {totals['write'][0] / SECONDS:8.0f}   "
+              f"'database is locked' errors: {totals['read'][1] + totals['write'][1]}")
+    finally:
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+if __name__ == '__main__':
+    multiprocessing.set_start_method('fork')
+    print(f'{WORKERS} worker processes, {SECONDS:.0f}s per run')
+    run('defaults', {})
+    run('profile', Config.SQLITE_PRAGMAS)
@@ -8,16 +8,71 @@ class Config:
     # Use SQLite for both local and Render deployment
     SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(basedir, 'vehicle_service.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SQLALCHEMY_ENGINE_OPTIONS = {}
+    # Each gunicorn sync worker is its own process with its own small pool;
+    # the extra connections cover the CLI and background threads.  Merged into
+    # SQLALCHEMY_ENGINE_OPTIONS except for in-memory SQLite (see app/database.py)
+    DATABASE_POOL_OPTIONS = {
+        'pool_size': 2,
+        'max_overflow': 4,
+        'pool_timeout': 10,
+    }
+    # Applied to every new SQLite connection (see app/database.py); set to {} to use SQLite's defaults
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',      # readers no longer block behind the writer
+        'synchronous': 'NORMAL',    # safe with WAL; fsync at checkpoints instead of every commit
+        'cache_size': -64000,       # page cache in KiB (64MB)
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,       # ms to wait for a lock instead of failing with "database is locked"
+    }
+    
+    # Funnel short writes (status updates, payments, new requests) through one
+    # writer thread per process that commits them in groups, see app/writes.py
+    WRITE_QUEUE = os.environ.get('WRITE_QUEUE') == '1'
+    WRITE_QUEUE_BATCH_SIZE = 64
+    WRITE_QUEUE_MAX_DELAY = 0.002  # seconds to wait for more writes to join a group
+    WRITE_QUEUE_RETRIES = 8        # attempts on "database is locked" before giving up
+    WRITE_QUEUE_TIMEOUT = 30       # seconds a request waits for its write to commit
     
     # Upload folders - use absolute path for Render compatibility
     UPLOAD_FOLDER = os.path.join(basedir, 'static', 'uploads')
     VEHICLE_UPLOAD_FOLDER = os.path.join(basedir, 'static', 'uploads', 'vehicles')
     DOCUMENT_UPLOAD_FOLDER = os.path.join(basedir, 'static', 'uploads', 'documents')
+    # Content-addressed store for new uploads (<ab>/<cd>/<sha256>.<ext>), see app/storage.py
+    STORAGE_FOLDER = os.path.join(basedir, 'static', 'uploads', 'store')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp', 'avif', 'bmp', 'svg', 'tiff', 'ico', 'pdf'}
     ALLOWED_IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp', 'bmp'}
     
+    # Resized copies served by /uploads/<width>/<filename>, evicted least recently used first
+    IMAGE_WIDTHS = (320, 640, 1280)
+    IMAGE_QUALITY = 80
+    IMAGE_CACHE_FOLDER = os.path.join(basedir, 'image_cache')
+    IMAGE_CACHE_MAX_BYTES = 256 * 1024 * 1024  # 256MB for the whole folder, shared by all workers
+    
+    # Uploaded photos are re-encoded in the background (0 workers = inline)
+    UPLOAD_IMAGE_MAX_SIDE = 2560
+    UPLOAD_IMAGE_QUALITY = 85
+    UPLOAD_IMAGE_WORKERS = 2
+    
+    # File delivery: 'app' streams files through Flask; 'x-accel' (nginx) and
+    # 'x-sendfile' (Apache/lighttpd) only run the access check and let the
+    # front proxy send the bytes
+    FILE_DELIVERY = os.environ.get('FILE_DELIVERY', 'app')
+    USE_X_SENDFILE = FILE_DELIVERY == 'x-sendfile'
+    # Folder config key -> internal nginx location used for X-Accel-Redirect
+    X_ACCEL_LOCATIONS = {
+        'UPLOAD_FOLDER': '/protected/uploads/',
+        'IMAGE_CACHE_FOLDER': '/protected/image_cache/',
+    }
+    
+    # Raise when a view touches a relationship it did not declare in app/loading.py
+    STRICT_LOADING = os.environ.get('STRICT_LOADING') == '1'
+    
+    # List pages (keyset pagination)
+    PAGE_SIZE = 25
+    MAX_PAGE_SIZE = 100
+    
     # Session configuration
     PERMANENT_SESSION_LIFETIME = timedelta(hours=24)
     
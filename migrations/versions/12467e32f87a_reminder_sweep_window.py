@@ -0,0 +1,35 @@
+"""reminder sweep window
+
+reminder_sweeps keeps the due-soon window a sweep was started with, so a
+resumed sweep uses the same one (see app/reminders.py).  Existing sweeps
+ran with the old fixed default of 30 days.  The column is only added when
+missing, because upgrade_database() creates reminder_sweeps from the
+current models for databases that predate it.
+
+Revision ID: 12467e32f87a
+Revises: 7019450d6e6c
+Create Date: 2026-10-17 22:24:17.663303
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '12467e32f87a'
+down_revision = '7019450d6e6c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('reminder_sweeps')}
+    if 'due_soon_days' in columns:
+        return
+    with op.batch_alter_table('reminder_sweeps', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('due_soon_days', sa.Integer(), server_default='30', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('reminder_sweeps', schema=None) as batch_op:
+        batch_op.drop_column('due_soon_days')
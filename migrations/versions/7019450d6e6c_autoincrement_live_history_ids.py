@@ -0,0 +1,51 @@
+"""autoincrement live history ids
+
+service_requests, service_records and invoices get AUTOINCREMENT, so SQLite
+never hands out an id again once its row is gone.  Without it a new row
+takes max(id) + 1, which after `flask archive run` moved the newest settled
+rows could be an id that already exists in the archive: the invoice link
+would open the new invoice and the next archive run would fail on the
+archive's primary key.
+
+The tables are rebuilt in batch mode (SQLite cannot add AUTOINCREMENT in
+place) and each sequence starts above the highest id in both the live and
+the archive table.
+
+Revision ID: 7019450d6e6c
+Revises: e1baccadfe5d
+Create Date: 2026-10-17 22:13:44.430225
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7019450d6e6c'
+down_revision = 'e1baccadfe5d'
+branch_labels = None
+depends_on = None
+
+# Live table -> archive table
+TABLES = (
+    ('service_requests', 'archived_service_requests'),
+    ('service_records', 'archived_service_records'),
+    ('invoices', 'archived_invoices'),
+)
+
+
+def upgrade():
+    for table, archive_table in TABLES:
+        with op.batch_alter_table(table, recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+            pass
+        op.execute(f"DELETE FROM sqlite_sequence WHERE name = '{table}'")
+        op.execute(
+            f"INSERT INTO sqlite_sequence (name, seq) SELECT '{table}', "
+            f"max(coalesce((SELECT max(id) FROM {table}), 0), coalesce((SELECT max(id) FROM {archive_table}), 0))"
+        )
+
+
+def downgrade():
+    for table, _ in reversed(TABLES):
+        with op.batch_alter_table(table, recreate='always', table_kwargs={'sqlite_autoincrement': False}):
+            pass
@@ -1,4 +1,5 @@
 from app import create_app, db
+from app.database import upgrade_database
 from app.models import User
 from config import Config
 import os
@@ -7,7 +8,7 @@ app = create_app()
 
 # Initialize on startup (for Render and other platforms)
 with app.app_context():
-    db.create_all()
+    upgrade_database(db)
     # Only seed if database is empty
     if User.query.count() == 0:
         print("Initializing database with seed data...")
@@ -29,6 +30,9 @@ with app.app_context():
             db.session.add(admin)
             db.session.commit()
             print("Default admin user created. Username: admin, Password: admin123")
+    # Don't hand this connection to forked gunicorn workers; each opens its own
+    db.session.remove()
+    db.engine.dispose()
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
@@ -4,6 +4,7 @@ Creates 5 users (Tamil Nadu names/places), each with 2 vehicles and 2 service re
 Run with: venv\Scripts\python.exe seed_data.py
 """
 from app import create_app, db
+from flask_migrate import stamp
 from app.models import User, Vehicle, ServiceRequest, ServiceRecord, Invoice, ServiceReminder
 from datetime import datetime, timedelta
 from decimal import Decimal
@@ -16,6 +17,8 @@ def seed_database():
         print("Resetting database...")
         db.drop_all()
         db.create_all()
+        # create_all() builds the latest schema; record that for flask db upgrade
+        stamp()
 
         # Admin
         admin = User(username='admin', email='admin@vehiclecare.local', full_name='Administrator', phone='+91-9000000000', role='admin')
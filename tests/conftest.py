@@ -0,0 +1,32 @@
+import os
+import pytest
+from app import create_app, db
+from app.models import User, Vehicle
+from config import Config
+
+
+@pytest.fixture
+def app(tmp_path):
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tmp_path, 'test.db')
+        WRITE_QUEUE = False
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def vehicle(app):
+    user = User(username='owner', email='owner@example.com', password_hash='-', full_name='Owner', role='customer')
+    db.session.add(user)
+    db.session.flush()
+    vehicle = Vehicle(user_id=user.id, registration_number='TN-01-0001', brand='Brand', model='Model',
+                      fuel_type='Petrol', manufacturing_year=2020, current_odometer=0)
+    db.session.add(vehicle)
+    db.session.commit()
+    return vehicle
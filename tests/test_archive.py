@@ -0,0 +1,43 @@
+from datetime import date, datetime
+from app import db
+from app.models import ServiceRequest, ServiceRecord, Invoice, ArchivedInvoice
+from app.archive import archive_history, find_invoice, tables_reusing_ids
+
+
+def add_history(vehicle, number, service_date, payment_status='paid'):
+    created_at = datetime.combine(service_date, datetime.min.time())
+    request = ServiceRequest(vehicle_id=vehicle.id, user_id=vehicle.user_id, service_type='Regular Service',
+                             preferred_date=service_date, status='completed', created_at=created_at)
+    db.session.add(request)
+    db.session.flush()
+    record = ServiceRecord(service_request_id=request.id, vehicle_id=vehicle.id, service_date=service_date,
+                           service_type='Regular Service', labor_charge=100, additional_cost=0, total_amount=100)
+    db.session.add(record)
+    db.session.flush()
+    invoice = Invoice(service_record_id=record.id, invoice_number=f'INV-{number}', amount=100,
+                      payment_status=payment_status, created_at=created_at)
+    db.session.add(invoice)
+    db.session.commit()
+    return request.id, record.id, invoice.id
+
+
+def test_live_tables_never_reuse_ids(app):
+    assert tables_reusing_ids() == []
+
+
+def test_archived_ids_are_not_shadowed_by_new_rows(app, vehicle):
+    add_history(vehicle, 1, date(2020, 1, 10))
+    # The newest rows of every table are settled and get archived
+    archived = add_history(vehicle, 2, date(2020, 2, 10))
+    assert archive_history(date(2021, 1, 1)) == 2
+
+    new = add_history(vehicle, 3, date.today(), payment_status='pending')
+    assert all(new_id > archived_id for new_id, archived_id in zip(new, archived))
+
+    invoice = find_invoice(archived[2])
+    assert isinstance(invoice, ArchivedInvoice)
+    assert invoice.invoice_number == 'INV-2'
+
+    # Later runs do not collide with what is already archived
+    add_history(vehicle, 4, date(2020, 3, 10))
+    assert archive_history(date(2021, 1, 1)) == 1
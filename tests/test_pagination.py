@@ -0,0 +1,16 @@
+from urllib.parse import urlsplit, parse_qs
+from flask import render_template_string
+from app.pagination import sort_url
+
+
+def test_sort_header_keeps_filters_and_page_size(app):
+    with app.test_request_context('/admin/vehicles?status=pending&per_page=50&after=abc&sort=spend&direction=asc'):
+        html = render_template_string(
+            "{% from 'sorting.html' import sort_header with context %}{{ sort_header('Services', 'services') }}",
+            sort='spend', descending=False
+        )
+        url = sort_url('services', 'desc')
+    assert url in html.replace('&amp;', '&')
+    assert parse_qs(urlsplit(url).query) == {
+        'status': ['pending'], 'per_page': ['50'], 'sort': ['services'], 'direction': ['desc']
+    }
@@ -0,0 +1,30 @@
+from datetime import date
+import click
+import pytest
+from app import db
+from app.models import ReminderSweep
+from app.reminders import sweep_reminders
+
+
+def interrupted_sweep(due_soon_days):
+    sweep = ReminderSweep(as_of=date.today(), last_reminder_id=0, due_soon_days=due_soon_days)
+    db.session.add(sweep)
+    db.session.commit()
+    return sweep.id
+
+
+def test_resume_keeps_the_stored_window(app):
+    sweep_id = interrupted_sweep(30)
+    sweep = sweep_reminders()
+    assert (sweep.id, sweep.due_soon_days, sweep.status) == (sweep_id, 30, 'completed')
+
+
+def test_resume_with_another_window_needs_restart(app):
+    sweep_id = interrupted_sweep(30)
+    with pytest.raises(click.ClickException):
+        sweep_reminders(due_soon_days=7)
+    assert db.session.get(ReminderSweep, sweep_id).status == 'running'
+
+    sweep = sweep_reminders(due_soon_days=7, restart=True)
+    assert sweep.id != sweep_id and sweep.due_soon_days == 7
+    assert db.session.get(ReminderSweep, sweep_id).status == 'abandoned'
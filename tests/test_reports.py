@@ -0,0 +1,61 @@
+import pytest
+from app import db
+from app.reports import report_queries, explain_query_plan, full_table_scans
+
+
+def query_plan(sql):
+    return [row[3] for row in db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}')]
+
+
+@pytest.mark.parametrize('sql, scanned', [
+    ("SELECT id FROM vehicles WHERE brand = 'x'", 'vehicles'),
+    # SQLite names an aliased table by its alias
+    ("SELECT v.id FROM vehicles AS v WHERE v.brand = 'x'", 'v'),
+    ("SELECT r.id FROM vehicles AS v JOIN service_records AS r ON r.vehicle_id = v.id WHERE v.brand = 'x'", 'v'),
+    # The scan inside a materialized subquery is reported, the scan of its result is not
+    ("SELECT a.n FROM (SELECT brand, count(*) AS n FROM vehicles GROUP BY brand) AS a "
+     "JOIN vehicles AS v ON v.brand = a.brand WHERE v.id = 1", 'vehicles'),
+])
+def test_full_table_scan_detected(app, sql, scanned):
+    plan = query_plan(sql)
+    assert [detail.split()[1] for detail in full_table_scans(plan)] == [scanned], plan
+
+
+@pytest.mark.parametrize('sql', [
+    "SELECT v.id FROM vehicles AS v WHERE v.id = 1",
+    "SELECT r.id FROM service_records AS r WHERE r.vehicle_id = 1",
+    "SELECT v.user_id FROM vehicles AS v WHERE v.is_deleted = 0 ORDER BY v.user_id",
+    "SELECT a.n FROM (SELECT vehicle_id, count(*) AS n FROM service_records GROUP BY vehicle_id) AS a "
+    "JOIN vehicles AS v ON v.id = a.vehicle_id",
+    "SELECT 1",
+])
+def test_index_access_not_reported(app, sql):
+    plan = query_plan(sql)
+    assert full_table_scans(plan) == [], plan
+
+
+@pytest.mark.parametrize('detail, reported', [
+    # Plan lines as SQLite before 3.36 prints them
+    ('SCAN TABLE vehicles', True),
+    ('SCAN TABLE vehicles AS v', True),
+    ('SCAN TABLE vehicles AS v USING COVERING INDEX ix_vehicles_user_created_where_live', False),
+    ('SEARCH TABLE invoices USING INDEX ix_invoices_created_where_live (created_at>? AND created_at<?)', False),
+])
+def test_legacy_plan_format(app, detail, reported):
+    assert full_table_scans([detail]) == ([detail] if reported else [])
+
+
+REPORT_QUERIES = (
+    'today_requests', 'recent_requests', 'request_status_counts', 'yearly_maintenance',
+    'vehicle_expenses', 'health_scores', 'vehicle_totals', 'customer_totals', 'expiring_documents',
+)
+
+
+def test_every_report_query_is_checked(app):
+    assert set(report_queries()) == set(REPORT_QUERIES)
+
+
+@pytest.mark.parametrize('name', REPORT_QUERIES)
+def test_report_query_uses_indexes(app, name):
+    plan = explain_query_plan(report_queries()[name])
+    assert not full_table_scans(plan), '\n'.join(plan)
@@ -0,0 +1,64 @@
+import os
+import pytest
+from flask import url_for
+from app import db
+from app.delivery import VERSION_LENGTH, file_digest, upload_url
+from app.storage import key_path
+
+
+@pytest.fixture
+def client(app, vehicle):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(vehicle.user_id)
+        session['_fresh'] = True
+    return client
+
+
+@pytest.mark.parametrize('page', ['vehicle.view', 'vehicle.list_vehicles'])
+def test_svg_photo_links_the_original(app, vehicle, client, page):
+    vehicle.image_path = 'a' * 64 + '.svg'
+    db.session.commit()
+    with app.test_request_context():
+        url = url_for(page, vehicle_id=vehicle.id) if page == 'vehicle.view' else url_for(page)
+        original = url_for('main.uploaded_file', filename=vehicle.image_path)
+    html = client.get(url).get_data(as_text=True)
+    assert original in html
+    assert '/uploads/640/' not in html
+
+
+def test_raster_photo_links_a_resized_copy(app, vehicle, client):
+    vehicle.image_path = 'a' * 64 + '.jpg'
+    db.session.commit()
+    with app.test_request_context():
+        url = url_for('vehicle.view', vehicle_id=vehicle.id)
+        resized = url_for('main.resized_upload', size=640, filename=vehicle.image_path)
+    assert resized in client.get(url).get_data(as_text=True)
+
+
+def _write_stored(key, data):
+    path = key_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def test_stored_upload_is_versioned_by_its_key(app, client, tmp_path):
+    app.config['STORAGE_FOLDER'] = str(tmp_path / 'storage')
+    key = 'b' * 64 + '.svg'
+    _write_stored(key, b'<svg/>')
+    with app.test_request_context():
+        url = upload_url(key)
+    assert url.endswith('?v=' + key[:VERSION_LENGTH])
+    assert 'immutable' in client.get(url).headers['Cache-Control']
+
+
+def test_normalized_upload_is_versioned_by_its_content(app, client, tmp_path):
+    app.config['STORAGE_FOLDER'] = str(tmp_path / 'storage')
+    key = 'c' * 64 + '.jpg'
+    path = _write_stored(key, b'rewritten in place')
+    with app.test_request_context():
+        url = upload_url(key)
+    assert url.endswith('?v=' + file_digest(path)[:VERSION_LENGTH])
+    assert 'immutable' in client.get(url).headers['Cache-Control']
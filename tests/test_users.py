@@ -0,0 +1,31 @@
+from app import db
+from app.models import User
+import pytest
+from app.users import invalidate_user, load_cached_user
+
+
+@pytest.fixture(autouse=True)
+def fresh_snapshot(vehicle):
+    # The snapshot cache is per process and ids repeat across test databases
+    invalidate_user(vehicle.user_id)
+
+
+def test_snapshot_is_dropped_on_commit(app, vehicle):
+    user = db.session.get(User, vehicle.user_id)
+    assert load_cached_user(user.id).role == 'customer'
+    user.role = 'staff'
+    db.session.flush()
+    # Another request in this process must not cache the uncommitted row
+    assert load_cached_user(user.id).role == 'customer'
+    db.session.commit()
+    assert load_cached_user(user.id).role == 'staff'
+
+
+def test_snapshot_survives_rollback(app, vehicle):
+    user = db.session.get(User, vehicle.user_id)
+    cached = load_cached_user(user.id)
+    user.role = 'staff'
+    db.session.flush()
+    db.session.rollback()
+    assert load_cached_user(user.id) is cached
+    assert 'written_user_ids' not in db.session.info